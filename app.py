@@ -2,9 +2,18 @@ import streamlit as st
 import os
 from pathlib import Path
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from video_processor import VideoProcessor
 from emotion_detector import EmotionDetector
+from decoded_audio import DecodedAudio
 from clip_generator import ClipGenerator
+from transcription_backends import available_backends, get_backend
+from render_profiles import RENDER_PROFILES, DEFAULT_PROFILE
+from clip_cache import clip_cache
+from llm_cache import llm_cache
+import llm_client
+from llm_client import TokenBucket, circuit_breaker
+from job_workspace import JobWorkspace, cleanup_expired_jobs
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -12,9 +21,31 @@ load_dotenv()
 
 # Configure Gemini API
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if not GEMINI_API_KEY:
+# Local stand-in for offline runs and load tests, see llm_stub_server.py
+LLM_ENDPOINT = os.getenv('LLM_ENDPOINT') or None
+# 'gemini' or 'local' (offline ranking, no API key needed)
+MOMENT_SELECTOR = os.getenv('MOMENT_SELECTOR', 'gemini')
+# 'auto' (map-reduce when the transcript overflows one prompt), 'single' or 'map_reduce'
+MOMENT_STRATEGY = os.getenv('MOMENT_STRATEGY', 'auto')
+LLM_PROMPT_TOKENS = int(os.getenv('LLM_PROMPT_TOKENS', '2000'))
+if not GEMINI_API_KEY and not LLM_ENDPOINT and MOMENT_SELECTOR != 'local':
     raise ValueError("GEMINI_API_KEY not found in .env file")
 
+WHISPER_MODEL_SIZE = os.getenv('WHISPER_MODEL_SIZE', 'base')
+TRANSCRIBE_WORKERS = int(os.getenv('TRANSCRIBE_WORKERS', '1'))
+TRANSCRIBE_BACKEND = os.getenv('TRANSCRIBE_BACKEND', 'whisper')
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', '1'))
+RENDER_THREADS = int(os.getenv('RENDER_THREADS', '0')) or None
+RENDER_PROFILE = os.getenv('RENDER_PROFILE', DEFAULT_PROFILE)
+clip_cache.max_bytes = int(os.getenv('CLIP_CACHE_MAX_MB', '2048')) * 1024 * 1024
+JOB_TTL_SECONDS = float(os.getenv('JOB_TTL_HOURS', '6')) * 3600
+llm_cache.ttl_seconds = float(os.getenv('LLM_CACHE_TTL_HOURS', '168')) * 3600
+LLM_REQUESTS_PER_MINUTE = float(os.getenv('LLM_REQUESTS_PER_MINUTE', '60'))
+LLM_BURST = int(os.getenv('LLM_BURST', '10'))
+circuit_breaker.failure_threshold = int(os.getenv('LLM_BREAKER_FAILURES', '5'))
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '60'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))
+
 # Page configuration
 st.set_page_config(
     page_title="PulsePoint AI",
@@ -22,6 +53,26 @@ st.set_page_config(
     layout="wide"
 )
 
+
+@st.cache_resource(show_spinner=False)
+def warm_up_transcription():
+    """Start loading the default transcription model once per server process"""
+    backend = TRANSCRIBE_BACKEND if TRANSCRIBE_BACKEND in available_backends() else 'whisper'
+    return get_backend(backend).warm_up(WHISPER_MODEL_SIZE)
+
+
+warm_up_transcription()
+
+
+@st.cache_resource(show_spinner=False)
+def install_rate_limiter():
+    """Build the LLM token bucket once per server process so every session shares one API quota"""
+    llm_client.rate_limiter = TokenBucket(rate=LLM_REQUESTS_PER_MINUTE / 60, burst=LLM_BURST)
+    return llm_client.rate_limiter
+
+
+install_rate_limiter()
+
 # Custom CSS
 st.markdown("""
     <style>
@@ -63,6 +114,8 @@ if 'processing_complete' not in st.session_state:
     st.session_state.processing_complete = False
 if 'output_clips' not in st.session_state:
     st.session_state.output_clips = []
+if 'job_workspace' not in st.session_state:
+    st.session_state.job_workspace = None
 
 def main():
     # Sidebar configuration
@@ -85,6 +138,32 @@ def main():
         st.subheader("Optional Features")
         enable_smart_crop = st.checkbox("Smart Crop to Vertical (9:16)", value=False)
         enable_captions = st.checkbox("Generate Dynamic Captions", value=False)
+        profiles = list(RENDER_PROFILES)
+        render_profile = st.selectbox(
+            "Render Profile",
+            profiles,
+            index=profiles.index(RENDER_PROFILE) if RENDER_PROFILE in profiles else profiles.index(DEFAULT_PROFILE),
+            help="draft renders fast, low-res previews for review; archive is for final deliverables"
+        )
+        backends = available_backends()
+        transcription_backend = st.selectbox(
+            "Transcription Engine",
+            backends,
+            index=backends.index(TRANSCRIBE_BACKEND) if TRANSCRIBE_BACKEND in backends else 0,
+            help="faster-whisper runs an int8 model, several times faster on CPU"
+        )
+        selectors = {'Gemini AI': 'gemini', 'Local ranking (offline)': 'local'}
+        moment_selector = selectors[st.selectbox(
+            "Moment Selection",
+            list(selectors),
+            index=1 if MOMENT_SELECTOR == 'local' else 0,
+            help="Local ranking scores loudness, hook phrases, speech rate and peaks in milliseconds, without an API key"
+        )]
+        enable_vad = st.checkbox(
+            "Skip Silence Before Transcription",
+            value=True,
+            help="Only send detected speech to Whisper (faster on videos with long pauses or music)"
+        )
         
         # Audio sensitivity
         sensitivity = st.slider(
@@ -134,7 +213,7 @@ def main():
         
         # Process button
         if st.button("🚀 Generate Clips", disabled=not video_path and not drive_link):
-            if not gemini_api_key:
+            if not gemini_api_key and not LLM_ENDPOINT and moment_selector != 'local':
                 st.error("⚠️ Please enter your Google Gemini API key in the sidebar")
             else:
                 process_video(
@@ -144,19 +223,28 @@ def main():
                     clip_duration,
                     sensitivity,
                     enable_smart_crop,
-                    enable_captions
+                    enable_captions,
+                    enable_vad,
+                    transcription_backend,
+                    render_profile,
+                    moment_selector
                 )
     
     with col2:
         st.header("🎥 Generated Clips")
         
         if st.session_state.processing_complete and st.session_state.output_clips:
+            # Viewing the clips keeps the job clear of TTL cleanup
+            if st.session_state.job_workspace:
+                st.session_state.job_workspace.touch()
+            
             st.success(f"✅ Generated {len(st.session_state.output_clips)} clips!")
             
             for idx, clip_info in enumerate(st.session_state.output_clips):
                 with st.expander(f"Clip {idx + 1}: {clip_info['title']}", expanded=True):
                     st.markdown(f"**Time Range:** {clip_info['start_time']:.1f}s - {clip_info['end_time']:.1f}s")
                     st.markdown(f"**Emotion Score:** {clip_info['score']:.2f}")
+                    st.markdown(f"**Render Profile:** {clip_info.get('render_profile', DEFAULT_PROFILE)}")
                     
                     if os.path.exists(clip_info['path']):
                         st.video(clip_info['path'])
@@ -179,12 +267,20 @@ def main():
             st.info("👈 Upload a video and click 'Generate Clips' to get started")
 
 
-def process_video(video_path, api_key, num_clips, clip_duration, sensitivity, smart_crop, captions):
+def process_video(video_path, api_key, num_clips, clip_duration, sensitivity, smart_crop, captions, vad=True,
+                  transcription_backend='whisper', render_profile=DEFAULT_PROFILE, moment_selector='gemini'):
     """Process the video and generate clips"""
     
     progress_bar = st.progress(0)
     status_text = st.empty()
     
+    # Each job writes to its own directory; the session's previous job is released
+    workspace = JobWorkspace().acquire()
+    if st.session_state.job_workspace:
+        st.session_state.job_workspace.release()
+    st.session_state.job_workspace = workspace
+    cleanup_expired_jobs(JOB_TTL_SECONDS)
+    
     try:
         # Step 1: Initialize processors
         status_text.text("🔧 Initializing processors...")
@@ -192,55 +288,107 @@ def process_video(video_path, api_key, num_clips, clip_duration, sensitivity, sm
         
         video_processor = VideoProcessor(video_path)
         emotion_detector = EmotionDetector(sensitivity=sensitivity)
-        clip_generator = ClipGenerator(api_key)
+        clip_generator = ClipGenerator(
+            api_key,
+            output_dir=workspace.path('clips'),
+            llm_endpoint=LLM_ENDPOINT,
+            llm_timeout=LLM_TIMEOUT_SECONDS,
+            llm_retries=LLM_MAX_RETRIES
+        )
+        
+        # Face tracking reads a low-res proxy; transcode it while the audio is analysed
+        proxy_executor = ThreadPoolExecutor(max_workers=1)
+        proxy_future = proxy_executor.submit(video_processor.get_analysis_proxy) if smart_crop else None
+        proxy_executor.shutdown(wait=False)
         
         # Step 2: Extract audio and analyze
         status_text.text("🎵 Analyzing audio for emotional peaks...")
         progress_bar.progress(25)
         
-        audio_path = video_processor.extract_audio()
-        emotional_peaks = emotion_detector.detect_peaks(audio_path, video_path)
+        # Decode once and share it between peak detection and transcription
+        try:
+            # Stream mono PCM straight from ffmpeg into a memory-mapped file, no WAV
+            # round trip. Decode at the rate the WAV path used so peak detection sees
+            # the same samples; transcription gets its 16 kHz copy from DecodedAudio.mono_16k
+            native_path = workspace.path('audio/native.npy')
+            audio = DecodedAudio(
+                video_processor.extract_audio_array(sample_rate=None, out_path=str(native_path)),
+                video_processor.audio_fps,
+                mmap_dir=str(native_path.parent)
+            )
+        except Exception as e:
+            print(f"Audio pipe failed, falling back to a temp WAV: {str(e)}")
+            audio_path = video_processor.extract_audio(str(workspace.path('audio.wav')))
+            audio = DecodedAudio.from_file(audio_path, mmap=True)
+            os.remove(audio_path)
+        
+        emotional_peaks = emotion_detector.detect_peaks(audio, video_path)
         
         # Step 3: Transcribe video
         status_text.text("📝 Transcribing video content...")
         progress_bar.progress(40)
         
-        transcript = emotion_detector.transcribe_audio(audio_path)
+        transcript = emotion_detector.transcribe_audio(
+            audio,
+            model_size=WHISPER_MODEL_SIZE,
+            vad=vad,
+            workers=TRANSCRIBE_WORKERS,
+            backend=transcription_backend
+        )
+        audio.close()
         
-        # Step 4: Use Gemini to identify best moments
-        status_text.text("🤖 Using AI to identify key moments...")
+        # Step 4: Use Gemini (or the local ranker) to identify best moments
+        if moment_selector == 'local':
+            status_text.text("📊 Ranking key moments locally...")
+        else:
+            status_text.text("🤖 Using AI to identify key moments...")
         progress_bar.progress(55)
         
         best_moments = clip_generator.identify_key_moments(
             transcript,
             emotional_peaks,
             num_clips,
-            clip_duration
+            clip_duration,
+            strategy='local' if moment_selector == 'local' else MOMENT_STRATEGY,
+            energy=emotion_detector.energy_envelope,
+            prompt_tokens=LLM_PROMPT_TOKENS
         )
         
         # Step 5: Generate clips
         status_text.text("✂️ Generating video clips...")
         progress_bar.progress(70)
         
+        analysis_proxy = None
+        if proxy_future:
+            try:
+                analysis_proxy = proxy_future.result()
+            except Exception as e:
+                print(f"Analysis proxy unavailable, tracking on the source: {str(e)}")
+        
+        # Render every clip from one opened source, reusing the processor's reader
+        clip_paths = clip_generator.create_clips(
+            video_path,
+            best_moments,
+            smart_crop=smart_crop,
+            add_captions=captions,
+            source=video_processor.video,
+            progress_callback=lambda done, total: progress_bar.progress(70 + done * 30 // total),
+            workers=RENDER_WORKERS,
+            encoder_threads=RENDER_THREADS,
+            profile=render_profile,
+            analysis_proxy=analysis_proxy
+        )
+        
         output_clips = []
-        for idx, moment in enumerate(best_moments):
-            clip_path = clip_generator.create_clip(
-                video_path,
-                moment,
-                idx,
-                smart_crop=smart_crop,
-                add_captions=captions
-            )
-            
+        for idx, (moment, clip_path) in enumerate(zip(best_moments, clip_paths)):
             output_clips.append({
                 'path': clip_path,
                 'title': moment.get('title', f'Clip {idx + 1}'),
                 'start_time': moment['start_time'],
                 'end_time': moment['end_time'],
-                'score': moment.get('score', 0.0)
+                'score': moment.get('score', 0.0),
+                'render_profile': render_profile
             })
-            
-            progress_bar.progress(70 + (idx + 1) * (30 // len(best_moments)))
         
         # Complete
         progress_bar.progress(100)
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from utils import atomic_output
+
+# Bump when rendering changes so stale clips aren't served
+CACHE_VERSION = 1
+
+
+def source_fingerprint(video_path, samples=16, sample_bytes=1024 * 1024):
+    """
+    Content hash of a video file from its size and evenly spaced samples
+    
+    Reads samples x sample_bytes instead of the whole file, so fingerprinting
+    a multi-gigabyte upload takes milliseconds. Re-uploads of the same file
+    hash the same even though they land at a new temp path.
+    
+    Args:
+        video_path: Path to the video
+        samples: Number of chunks read across the file
+        sample_bytes: Size of each chunk
+        
+    Returns:
+        Hex digest
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha256(str(size).encode())
+    
+    with open(video_path, 'rb') as f:
+        if size <= samples * sample_bytes:
+            digest.update(f.read())
+        else:
+            step = (size - sample_bytes) // (samples - 1)
+            for i in range(samples):
+                f.seek(i * step)
+                digest.update(f.read(sample_bytes))
+    
+    return digest.hexdigest()
+
+
+class ClipCache:
+    """Size-bounded LRU store of rendered clips keyed by source content and render options"""
+    
+    def __init__(self, cache_dir=None, max_bytes=2 * 1024 ** 3):
+        """
+        Initialize the clip cache
+        
+        Args:
+            cache_dir: Directory holding cached clips, a temp subdirectory by default
+            max_bytes: Total size kept before least recently used clips are evicted
+        """
+        self.cache_dir = Path(cache_dir or Path(tempfile.gettempdir()) / "pulsepoint_clip_cache")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        
+        self._lock = threading.Lock()
+        self._fingerprints = {}
+    
+    def fingerprint(self, video_path):
+        """
+        Source fingerprint, memoized per path, size and modification time
+        
+        Args:
+            video_path: Path to the video
+            
+        Returns:
+            Hex digest
+        """
+        stat = os.stat(video_path)
+        memo_key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+        
+        with self._lock:
+            if memo_key in self._fingerprints:
+                return self._fingerprints[memo_key]
+        
+        fingerprint = source_fingerprint(video_path)
+        with self._lock:
+            self._fingerprints[memo_key] = fingerprint
+        return fingerprint
+    
+    def key(self, video_path, moment, options):
+        """
+        Cache key for one clip
+        
+        Args:
+            video_path: Path to source video
+            moment: Moment dictionary with start/end times
+            options: JSON-serializable render options (crop, caption, profile, ...)
+            
+        Returns:
+            Hex digest
+        """
+        payload = json.dumps({
+            'version': CACHE_VERSION,
+            'source': self.fingerprint(video_path),
+            'start': round(float(moment['start_time']), 3),
+            'end': round(float(moment['end_time']), 3),
+            'options': options
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def _path(self, key):
+        """Location of a cached clip"""
+        return self.cache_dir / f"{key}.mp4"
+    
+    def fetch(self, key, output_path):
+        """
+        Place a cached clip at output_path
+        
+        Args:
+            key: Cache key
+            output_path: Where the clip should appear
+            
+        Returns:
+            True on a hit, False when the clip must be rendered
+        """
+        cached = self._path(key)
+        
+        try:
+            # Mark as recently used
+            os.utime(cached)
+            _link_or_copy(cached, output_path)
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def store(self, key, clip_path):
+        """
+        Add a rendered clip and evict least recently used clips over the size bound
+        
+        Args:
+            key: Cache key
+            clip_path: Rendered clip, left in place
+        """
+        # Write under a temporary name so readers never see a partial file
+        with atomic_output(self._path(key), suffix='.part') as tmp_path:
+            _link_or_copy(clip_path, tmp_path)
+        
+        self._evict()
+    
+    def _evict(self):
+        """Delete least recently used clips until the cache fits max_bytes"""
+        with self._lock:
+            entries = []
+            for path in self.cache_dir.glob("*.mp4"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+    
+    def clear(self):
+        """Remove every cached clip"""
+        with self._lock:
+            for path in self.cache_dir.glob("*.mp4"):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+
+def _link_or_copy(src, dst):
+    """
+    Hard-link src to dst, copying when linking isn't possible
+    
+    Args:
+        src: Existing file
+        dst: Destination path, replaced if it exists
+    """
+    dst = str(dst)
+    if os.path.exists(dst):
+        os.remove(dst)
+    
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+# Shared by every ClipGenerator in the process
+clip_cache = ClipCache()
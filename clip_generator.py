@@ -1,75 +1,320 @@
 import os
+import multiprocessing
+import math
 import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
 import google.generativeai as genai
-from moviepy import VideoFileClip, TextClip, CompositeVideoClip
+from moviepy import VideoFileClip
 import cv2
+import fast_cut
+import render_profiles
+import smart_crop as face_crop
+from clip_cache import clip_cache
+from llm_cache import llm_cache
+from llm_client import AsyncLLMClient, GeminiBackend, HTTPBackend
+import moment_discovery
+import moment_ranker
+from smart_crop import MEDIAPIPE_AVAILABLE, MP_FACE_DETECTION
+from utils import atomic_output
 
-# Try to import mediapipe with fallback for different versions
-try:
-    import mediapipe as mp
-    # Check if solutions attribute exists (older API)
-    if hasattr(mp, 'solutions'):
-        MP_FACE_DETECTION = mp.solutions.face_detection
-        MEDIAPIPE_AVAILABLE = True
-    else:
-        # Newer mediapipe versions have different structure
-        MEDIAPIPE_AVAILABLE = False
-        MP_FACE_DETECTION = None
-except ImportError:
-    MEDIAPIPE_AVAILABLE = False
-    MP_FACE_DETECTION = None
+# Bump when the moment prompt or its parsing changes so cached responses are dropped
+MOMENT_PROMPT_VERSION = 2
+
+# Tried in order when the requested caption font isn't installed
+CAPTION_FALLBACK_FONTS = ('arialbd.ttf', 'Arial Bold.ttf', 'DejaVuSans-Bold.ttf', 'LiberationSans-Bold.ttf')
+
+
+def _load_caption_font(font, size):
+    """
+    Load a TrueType font by name or file, falling back to common bold fonts
+    
+    Args:
+        font: Font name or path
+        size: Font size in pixels
+        
+    Returns:
+        PIL font
+    """
+    for candidate in (font, f"{font}.ttf") + CAPTION_FALLBACK_FONTS:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+def _wrap_caption(draw, text, font, max_width, stroke_width):
+    """
+    Greedily wrap words into lines no wider than max_width
+    
+    Args:
+        draw: PIL ImageDraw used for measuring
+        text: Caption text
+        font: PIL font
+        max_width: Maximum line width in pixels
+        stroke_width: Outline width included in the measurement
+        
+    Returns:
+        List of lines
+    """
+    lines = []
+    for word in text.split():
+        candidate = f"{lines[-1]} {word}" if lines else word
+        if lines and draw.textlength(candidate, font=font) + 2 * stroke_width <= max_width:
+            lines[-1] = candidate
+        else:
+            lines.append(word)
+    return lines
+
+
+@lru_cache(maxsize=64)
+def _caption_tile(text, font, size, width, stroke_width=2):
+    """
+    Rasterize a caption once into a tile cropped to its bounding box
+    
+    Args:
+        text: Caption text
+        font: Font name or path
+        size: Font size in pixels
+        width: Maximum caption width in pixels
+        stroke_width: Black outline width in pixels
+        
+    Returns:
+        Tuple of (premultiplied RGB uint16 array, 255 - alpha uint16 array),
+        both shaped to the tile; treat as read-only, they are shared
+    """
+    pil_font = _load_caption_font(font, size)
+    measure = ImageDraw.Draw(Image.new('L', (1, 1)))
+    text = '\n'.join(_wrap_caption(measure, text, pil_font, width, stroke_width))
+    
+    left, top, right, bottom = measure.multiline_textbbox(
+        (0, 0), text, font=pil_font, stroke_width=stroke_width, align='center'
+    )
+    image = Image.new('RGBA', (int(np.ceil(right - left)), int(np.ceil(bottom - top))), (0, 0, 0, 0))
+    ImageDraw.Draw(image).multiline_text(
+        (-left, -top), text, font=pil_font, fill=(255, 255, 255, 255),
+        stroke_width=stroke_width, stroke_fill=(0, 0, 0, 255), align='center'
+    )
+    
+    # Crop away fully transparent margins so blending touches only inked pixels
+    bbox = image.getbbox()
+    if bbox:
+        image = image.crop(bbox)
+    
+    rgba = np.asarray(image, dtype=np.uint16)
+    alpha = rgba[:, :, 3:]
+    return (rgba[:, :, :3] * alpha + 127) // 255, 255 - alpha
+
+
+def _blend_tile(frame, premultiplied, inverse_alpha, x, y):
+    """
+    Alpha-blend a caption tile into a frame region
+    
+    Args:
+        frame: HxWx3 uint8 frame, written in place when writeable
+        premultiplied: Tile RGB multiplied by alpha
+        inverse_alpha: 255 - tile alpha
+        x: Left edge of the tile in the frame
+        y: Top edge of the tile in the frame
+        
+    Returns:
+        The blended frame
+    """
+    if not frame.flags.writeable:
+        # Decoder frames can be read-only views of its buffer
+        frame = frame.copy()
+    
+    # Clip the tile to the frame
+    h = min(premultiplied.shape[0], frame.shape[0] - y)
+    w = min(premultiplied.shape[1], frame.shape[1] - x)
+    ty, tx = max(0, -y), max(0, -x)
+    y, x = max(0, y), max(0, x)
+    if h <= ty or w <= tx:
+        return frame
+    
+    region = frame[y:y + h - ty, x:x + w - tx]
+    blended = (region * inverse_alpha[ty:h, tx:w] + 127) // 255 + premultiplied[ty:h, tx:w]
+    region[...] = blended.astype(np.uint8)
+    return frame
+
+
+# Per-process state of render workers: a generator and one reader per source
+_render_worker = {}
+
+
+def _init_render_worker(output_dir, analysis_proxies, frame_sizes):
+    """
+    Set up a render worker process (no Gemini client needed)
+    
+    Args:
+        output_dir: Directory the parent's generator writes clips to
+        analysis_proxies: The parent's analysis proxy per source
+        frame_sizes: The parent's known frame size per video path
+    """
+    _render_worker['generator'] = ClipGenerator(None, output_dir=output_dir)
+    _render_worker['generator'].analysis_proxies.update(analysis_proxies)
+    _render_worker['generator'].frame_sizes.update(frame_sizes)
+    _render_worker['sources'] = {}
+
+
+def _render_clip_in_worker(video_path, moment, clip_index, smart_crop, add_captions, cut_mode, threads, profile):
+    """
+    Render one clip inside a worker process, reusing the worker's open source
+    
+    Args:
+        video_path: Path to source video
+        moment: Moment dictionary with start/end times
+        clip_index: Index of this clip
+        smart_crop: Whether to crop to vertical format
+        add_captions: Whether to add captions
+        cut_mode: See ClipGenerator.create_clip
+        threads: Encoder threads for this clip
+        profile: Render profile settings
+        
+    Returns:
+        Path to generated clip
+    """
+    generator = _render_worker['generator']
+    sources = _render_worker['sources']
+    
+    def open_source():
+        if video_path not in sources:
+            sources[video_path] = VideoFileClip(video_path)
+        return sources[video_path]
+    
+    return generator._render_clip(
+        video_path, moment, generator._clip_output_path(clip_index), smart_crop, add_captions, cut_mode,
+        threads, profile, open_source
+    )
 
 
 class ClipGenerator:
     """Generates short clips from long-form video using AI analysis"""
     
-    def __init__(self, gemini_api_key):
+    def __init__(self, gemini_api_key, output_dir=None, llm_endpoint=None, llm_timeout=60.0, llm_retries=3):
         """
         Initialize the clip generator
         
         Args:
-            gemini_api_key: Google Gemini API key
+            gemini_api_key: Google Gemini API key, or None for render-only use
+            output_dir: Directory clips are written to; give each job its own
+                so concurrent jobs don't overwrite each other's clips
+            llm_endpoint: URL of an HTTP stand-in (see llm_stub_server) used
+                instead of Gemini
+            llm_timeout: Seconds allowed per model request attempt
+            llm_retries: Retries for rate-limited, failed or timed out requests
         """
         self.api_key = gemini_api_key
-        genai.configure(api_key=gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model_name = 'gemini-1.5-flash'
+        self.output_dir = Path(output_dir) if output_dir else Path(tempfile.gettempdir()) / "pulsepoint_clips"
+        self.model = None
+        self.llm_client = None
+        if llm_endpoint:
+            # Keep stand-in answers apart from Gemini's in the cache
+            self.model_name = llm_endpoint
+            self.llm_client = AsyncLLMClient(
+                HTTPBackend(llm_endpoint, llm_timeout), timeout=llm_timeout, max_retries=llm_retries
+            )
+        elif gemini_api_key:
+            genai.configure(api_key=gemini_api_key)
+            self.model = genai.GenerativeModel(self.model_name)
+            self.llm_client = AsyncLLMClient(
+                GeminiBackend(self.model, llm_timeout), timeout=llm_timeout, max_retries=llm_retries
+            )
         
         # MediaPipe for face detection (if available)
         self.mp_face_detection = MP_FACE_DETECTION
         self.face_detection = None
         self.mediapipe_available = MEDIAPIPE_AVAILABLE
+        
+        # Rendered clips keyed by source content and render options
+        self.clip_cache = clip_cache
+        
+        # Validated moments keyed by prompt inputs and model
+        self.llm_cache = llm_cache
+        
+        # Low-res copies of sources for analysis, see VideoProcessor.get_analysis_proxy
+        self.analysis_proxies = {}
+        
+        # (width, height) per video path, so each file is probed at most once
+        self.frame_sizes = {}
     
-    def identify_key_moments(self, transcript, emotional_peaks, num_clips=5, clip_duration=60):
+    def identify_key_moments(self, transcript, emotional_peaks, num_clips=5, clip_duration=60, use_cache=True,
+                             strategy='auto', window_tokens=2000, max_workers=8, energy=None, prompt_tokens=2000):
         """
-        Use Gemini AI to identify the most valuable moments for clips
+        Use Gemini AI (or the local ranker) to identify the most valuable moments for clips
         
         Args:
             transcript: Video transcript with timestamps
             emotional_peaks: List of emotional peak moments
             num_clips: Number of clips to generate
             clip_duration: Target duration for each clip
+            use_cache: Reuse the moments from an earlier identical request
+            strategy: 'single' sends one prompt packed to prompt_tokens, keeping
+                the lines nearest emotional peaks; 'map_reduce' covers the whole
+                transcript in windows; 'auto' picks map_reduce when the
+                transcript doesn't fit in prompt_tokens, so nothing is dropped;
+                'local' ranks windows offline with moment_ranker, no API call
+            window_tokens: Transcript token budget per map-reduce window
+            max_workers: Concurrent model calls in map-reduce
+            energy: Optional (times, values) loudness envelope used by local
+                ranking, see EmotionDetector.energy_envelope
+            prompt_tokens: Transcript token budget of the single prompt
             
         Returns:
             List of key moments with start/end times and metadata
         """
+        if strategy == 'local':
+            return self._create_fallback_moments(emotional_peaks, num_clips, clip_duration, transcript, energy)
+        
         # Prepare prompt for Gemini
         transcript_text = transcript.get('text', '') if transcript else ''
         segments = transcript.get('segments', []) if transcript else []
         
+        if strategy == 'auto':
+            fits = moment_discovery.transcript_tokens(segments) <= prompt_tokens
+            strategy = 'single' if fits else 'map_reduce'
+        
+        if strategy == 'map_reduce':
+            return self._map_reduce_moments(
+                segments, emotional_peaks, num_clips, clip_duration, use_cache, window_tokens, max_workers, energy
+            )
+        
+        # Compact timestamped lines; over budget, the lines nearest the peaks win
+        if segments:
+            packed_transcript, _ = moment_discovery.pack_transcript(segments, emotional_peaks, prompt_tokens)
+        else:
+            packed_transcript = transcript_text[:prompt_tokens * moment_discovery.CHARS_PER_TOKEN]
+        
         # Create a summary of emotional peaks
-        peaks_summary = "\n".join([
-            f"Peak at {peak['time']:.1f}s (score: {peak['score']:.2f})"
-            for peak in emotional_peaks[:20]  # Top 20 peaks
-        ])
+        peaks_summary = moment_discovery.compact_peaks(emotional_peaks, limit=20)
+        
+        # Same inputs and model give the same moments; skip the API call
+        cache_key = None
+        if use_cache:
+            cache_key = self.llm_cache.key(
+                version=MOMENT_PROMPT_VERSION,
+                model=self.model_name,
+                transcript=packed_transcript,
+                peaks=peaks_summary,
+                num_clips=num_clips,
+                clip_duration=clip_duration
+            )
+            cached_moments = self.llm_cache.get(cache_key)
+            if cached_moments is not None:
+                return cached_moments
         
         # Create prompt
         prompt = f"""You are an expert video editor analyzing a long-form video to extract the most viral-worthy, high-impact short clips.
 
-VIDEO TRANSCRIPT:
-{transcript_text[:8000]}  # Limit to avoid token limits
+VIDEO TRANSCRIPT (each line is [start second] text and lasts until the next line; "..." marks skipped parts):
+{packed_transcript}
 
-EMOTIONAL PEAKS (high energy moments):
+EMOTIONAL PEAKS (high energy moments, second:score):
 {peaks_summary}
 
 TASK:
@@ -97,6 +342,7 @@ Return exactly {num_clips} moments in this JSON format:
 
 IMPORTANT: 
 - Make sure start_time and end_time are actual numbers (floats)
+- start_time must be the start second of a transcript line
 - Each clip should be approximately {clip_duration} seconds long
 - Clips should not overlap
 - Return ONLY the JSON array, no other text
@@ -104,8 +350,7 @@ IMPORTANT:
         
         try:
             # Call Gemini API
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
+            response_text = self._generate_sync(prompt).strip()
             
             # Extract JSON from response
             import json
@@ -114,58 +359,145 @@ IMPORTANT:
             # Try to find JSON array in response
             json_match = re.search(r'\[\s*\{.*\}\s*\]', response_text, re.DOTALL)
             
+            moments_data = []
             if json_match:
-                moments_data = json.loads(json_match.group())
-            else:
-                # Fallback: create moments from emotional peaks
-                moments_data = self._create_fallback_moments(
-                    emotional_peaks,
-                    num_clips,
-                    clip_duration
-                )
+                # Put the model's starts back on real segment boundaries
+                moments_data = moment_discovery.snap_to_segments(json.loads(json_match.group()), segments)
+            
+            if not moments_data:
+                # Fallback: rank moments locally
+                return self._create_fallback_moments(emotional_peaks, num_clips, clip_duration, transcript, energy)
             
             # Validate and adjust moments
             validated_moments = self._validate_moments(moments_data, clip_duration)
             
+            # Only real model answers are cached, never the local fallback
+            if cache_key and validated_moments:
+                try:
+                    self.llm_cache.set(cache_key, validated_moments)
+                except Exception as e:
+                    print(f"Could not cache moments: {str(e)}")
+            
             return validated_moments
             
         except Exception as e:
             print(f"Error calling Gemini API: {str(e)}")
-            # Fallback to peak-based selection
-            return self._create_fallback_moments(emotional_peaks, num_clips, clip_duration)
+            # Fallback to local ranking
+            return self._create_fallback_moments(emotional_peaks, num_clips, clip_duration, transcript, energy)
     
-    def _create_fallback_moments(self, emotional_peaks, num_clips, clip_duration):
+    def _map_reduce_moments(self, segments, emotional_peaks, num_clips, clip_duration, use_cache, window_tokens,
+                            max_workers, energy=None):
         """
-        Create moments based on emotional peaks when AI fails
+        Find moments across the whole transcript with one model call per window
+        
+        Map: each token-budgeted window is asked for candidates concurrently.
+        Reduce: candidates are ranked locally and a non-overlapping set chosen,
+        so latency follows the slowest window rather than the video length.
         
         Args:
-            emotional_peaks: List of emotional peaks
-            num_clips: Number of clips to create
-            clip_duration: Duration of each clip
+            segments: Transcript segments with timestamps
+            emotional_peaks: List of emotional peak moments
+            num_clips: Number of clips to generate
+            clip_duration: Target duration for each clip
+            use_cache: Reuse the moments from an earlier identical request
+            window_tokens: Transcript token budget per window
+            max_workers: Concurrent model calls
+            energy: Optional loudness envelope for the local fallback
             
         Returns:
-            List of moment dictionaries
+            List of key moments with start/end times and metadata
         """
-        moments = []
+        windows = moment_discovery.build_windows(segments, window_tokens)
         
-        for i, peak in enumerate(emotional_peaks[:num_clips]):
-            peak_time = peak['time']
-            
-            # Center the clip around the peak
-            start_time = max(0, peak_time - clip_duration / 2)
-            end_time = start_time + clip_duration
+        # Ask each window for its share of the clips, with headroom for the reduce step
+        num_candidates = min(num_clips, max(2, math.ceil(2 * num_clips / max(1, len(windows)))))
+        prompts = [
+            moment_discovery.window_prompt(window, emotional_peaks, num_candidates, clip_duration)
+            for window in windows
+        ]
+        
+        cache_key = None
+        if use_cache:
+            cache_key = self.llm_cache.key(
+                version=MOMENT_PROMPT_VERSION,
+                strategy='map_reduce',
+                model=self.model_name,
+                prompts=prompts,
+                num_clips=num_clips,
+                clip_duration=clip_duration
+            )
+            cached_moments = self.llm_cache.get(cache_key)
+            if cached_moments is not None:
+                return cached_moments
+        
+        # One event loop drives every window; the shared rate limiter paces them
+        if self.llm_client and prompts:
+            responses = self.llm_client.generate_many_sync(prompts, max_workers)
+        else:
+            responses = [Exception("No LLM configured")] * len(prompts)
+        
+        results = []
+        for response in responses:
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                results.append(moment_discovery.parse_moments(response.strip()) or [])
+            except Exception as e:
+                print(f"Error calling Gemini API for a transcript window: {str(e)}")
+                results.append(None)
+        
+        candidates = [moment for result in results if result for moment in result]
+        if not candidates:
+            # Fallback to local ranking
+            return self._create_fallback_moments(
+                emotional_peaks, num_clips, clip_duration, {'segments': segments}, energy
+            )
+        
+        candidates = moment_discovery.snap_to_segments(candidates, segments)
+        selected = moment_discovery.rank_candidates(candidates, emotional_peaks, num_clips, clip_duration)
+        validated_moments = self._validate_moments(selected, clip_duration)
+        
+        # A window that failed would make this answer incomplete; don't remember it
+        if cache_key and validated_moments and all(result is not None for result in results):
+            try:
+                self.llm_cache.set(cache_key, validated_moments)
+            except Exception as e:
+                print(f"Could not cache moments: {str(e)}")
+        
+        return validated_moments
+    
+    def _generate_sync(self, prompt):
+        """
+        Model response text for a prompt, with rate limiting, timeouts and retries
+        
+        Args:
+            prompt: Prompt text
             
-            moments.append({
-                'start_time': start_time,
-                'end_time': end_time,
-                'title': f'High Energy Moment {i + 1}',
-                'hook': 'Watch this powerful moment',
-                'reason': f'Emotional peak detected (score: {peak["score"]:.2f})',
-                'estimated_virality': int(peak['score'] * 10),
-                'score': peak['score']
-            })
+        Returns:
+            Response text
+        """
+        if not self.llm_client:
+            raise Exception("No LLM configured, set a Gemini API key or LLM_ENDPOINT")
+        return self.llm_client.generate_sync(prompt)
+    
+    def _create_fallback_moments(self, emotional_peaks, num_clips, clip_duration, transcript=None, energy=None):
+        """
+        Rank moments locally, when AI fails or strategy='local' is requested
         
-        return moments
+        Args:
+            emotional_peaks: List of emotional peaks
+            num_clips: Number of clips to create
+            clip_duration: Duration of each clip
+            transcript: Optional transcript; clips then start on sentence
+                boundaries and hook phrases and speech rate count
+            energy: Optional (times, values) loudness envelope
+            
+        Returns:
+            List of non-overlapping moment dictionaries, best first, shaped
+            like validated model answers
+        """
+        moments = moment_ranker.rank_moments(transcript, emotional_peaks, num_clips, clip_duration, energy)
+        return self._validate_moments(moments, clip_duration)
     
     def _validate_moments(self, moments, clip_duration):
         """
@@ -198,12 +530,14 @@ IMPORTANT:
                 'title': moment.get('title', 'Clip'),
                 'hook': moment.get('hook', ''),
                 'reason': moment.get('reason', ''),
-                'score': moment.get('estimated_virality', 5) / 10.0
+                # Local ranking has a finer score than the 1-10 virality estimate
+                'score': moment.get('score', moment.get('estimated_virality', 5) / 10.0)
             })
         
         return validated
     
-    def create_clip(self, video_path, moment, clip_index, smart_crop=False, add_captions=False):
+    def create_clip(self, video_path, moment, clip_index, smart_crop=False, add_captions=False, cut_mode='smart',
+                    profile=render_profiles.DEFAULT_PROFILE, use_cache=True, analysis_proxy=None):
         """
         Create a video clip from a moment
         
@@ -213,56 +547,523 @@ IMPORTANT:
             clip_index: Index of this clip
             smart_crop: Whether to crop to vertical format
             add_captions: Whether to add captions
+            cut_mode: How to cut when no effects are requested: 'smart' re-encodes
+                only up to the first keyframe, 'keyframe' stream-copies from the
+                keyframe before the start, 'reencode' always re-encodes
+            profile: Render profile name for re-encoded clips, see render_profiles;
+                stream-copied clips keep the source encoding
+            use_cache: Reuse an identical earlier render from the clip cache
+            analysis_proxy: Optional low-res copy of video_path that face
+                tracking reads instead of the source
             
         Returns:
             Path to generated clip
         """
-        # Create output directory
-        output_dir = Path(tempfile.gettempdir()) / "pulsepoint_clips"
-        output_dir.mkdir(exist_ok=True)
+        profile = render_profiles.get_render_profile(profile)
+        if analysis_proxy:
+            self.analysis_proxies[video_path] = analysis_proxy
+        output_path = self._clip_output_path(clip_index)
+        
+        cache_key = None
+        if use_cache:
+            cache_key = self._cache_key(video_path, moment, smart_crop, add_captions, cut_mode, profile)
+        if cache_key and self.clip_cache.fetch(cache_key, output_path):
+            return str(output_path)
+        
+        sources = []
         
-        output_path = output_dir / f"clip_{clip_index + 1}.mp4"
+        def open_source():
+            if not sources:
+                sources.append(VideoFileClip(video_path))
+            return sources[0]
         
         try:
-            # Load video
-            video = VideoFileClip(video_path)
+            clip_path = self._render_clip(
+                video_path, moment, output_path, smart_crop, add_captions, cut_mode, None, profile, open_source
+            )
             
-            # Extract subclip
-            start_time = moment['start_time']
-            end_time = min(moment['end_time'], video.duration)
+        except Exception as e:
+            print(f"Error creating clip: {str(e)}")
+            raise
             
-            # Use subclipped for newer moviepy versions, fallback to subclip
-            try:
-                clip = video.subclipped(start_time, end_time)
-            except AttributeError:
-                clip = video.subclip(start_time, end_time)
+        finally:
+            # Cleanup
+            for video in sources:
+                video.close()
+        
+        if cache_key:
+            self._cache_store(cache_key, clip_path)
+        
+        return clip_path
+    
+    def create_clips(self, video_path, moments, smart_crop=False, add_captions=False, cut_mode='smart',
+                     source=None, progress_callback=None, workers=1, encoder_threads=None,
+                     profile=render_profiles.DEFAULT_PROFILE, use_cache=True,
+                     analysis_proxy=None):
+        """
+        Create clips for several moments from one opened source
+        
+        The source is opened (and probed) once and the moments are rendered in
+        start-time order so the shared reader only ever seeks forward. With
+        workers > 1 the clips are rendered in a process pool instead, each
+        worker keeping its own reader. Clips already in the clip cache are
+        returned without rendering.
+        
+        Args:
+            video_path: Path to source video
+            moments: List of moment dictionaries with start/end times
+            smart_crop: Whether to crop to vertical format
+            add_captions: Whether to add captions
+            cut_mode: See create_clip
+            source: Optional already opened VideoFileClip of video_path to reuse;
+                its size also spares probing the file
+            progress_callback: Optional callable(done, total) after each clip
+            workers: Number of render processes
+            encoder_threads: x264 threads per clip; defaults to the profile's,
+                capped at an even share of the cores so workers x threads never
+                exceeds them
+            profile: Render profile name, see create_clip
+            use_cache: Reuse identical earlier renders from the clip cache
+            analysis_proxy: See create_clip
             
-            # Smart crop to vertical if enabled
-            if smart_crop:
-                clip = self._crop_to_vertical_centered(clip)
+        Returns:
+            List of clip paths, in the same order as moments
+        """
+        clip_paths = [None] * len(moments)
+        order = sorted(range(len(moments)), key=lambda i: moments[i]['start_time'])
+        profile = render_profiles.get_render_profile(profile)
+        if analysis_proxy:
+            self.analysis_proxies[video_path] = analysis_proxy
+        if source is not None:
+            self.frame_sizes[video_path] = tuple(source.size)
+        
+        # Serve unchanged clips from the cache; only the rest are rendered
+        cache_keys = {}
+        if use_cache:
+            for idx in order:
+                cache_keys[idx] = self._cache_key(
+                    video_path, moments[idx], smart_crop, add_captions, cut_mode, profile
+                )
+                output_path = self._clip_output_path(idx)
+                if cache_keys[idx] and self.clip_cache.fetch(cache_keys[idx], output_path):
+                    clip_paths[idx] = str(output_path)
+            order = [idx for idx in order if clip_paths[idx] is None]
+        
+        cached = len(moments) - len(order)
+        if progress_callback and cached:
+            progress_callback(cached, len(moments))
+        if not order:
+            return clip_paths
+        
+        def report(done, total):
+            if progress_callback:
+                progress_callback(cached + done, len(moments))
+        
+        workers = max(1, min(workers, len(order)))
+        if encoder_threads is None:
+            # The profile's count, but never more than this worker's share of the cores
+            encoder_threads = max(1, min(profile['threads'], (os.cpu_count() or 1) // workers))
+        
+        if workers > 1:
+            rendered = self._create_clips_parallel(
+                video_path, moments, order, smart_crop, add_captions, cut_mode,
+                report, workers, encoder_threads, profile
+            )
+        else:
+            rendered = self._create_clips_sequential(
+                video_path, moments, order, smart_crop, add_captions, cut_mode,
+                source, report, encoder_threads, profile
+            )
+        
+        for idx in order:
+            clip_paths[idx] = rendered[idx]
+            if cache_keys.get(idx):
+                self._cache_store(cache_keys[idx], rendered[idx])
+        
+        return clip_paths
+    
+    def _create_clips_sequential(self, video_path, moments, order, smart_crop, add_captions, cut_mode,
+                                 source, progress_callback, encoder_threads, profile):
+        """
+        Render clips one after another from one opened source
+        
+        Args:
+            video_path: Path to source video
+            moments: List of moment dictionaries
+            order: Moment indices in render order
+            smart_crop: Whether to crop to vertical format
+            add_captions: Whether to add captions
+            cut_mode: See create_clip
+            source: Optional already opened VideoFileClip of video_path to reuse
+            progress_callback: Callable(done, total) after each clip
+            encoder_threads: Encoder threads per clip
+            profile: Render profile settings
             
-            # Add captions if enabled
-            if add_captions and moment.get('hook'):
-                clip = self._add_caption_overlay(clip, moment['hook'])
+        Returns:
+            List of clip paths indexed like moments, None for moments not in order
+        """
+        clip_paths = [None] * len(moments)
+        owned = []
+        
+        def open_source():
+            if source is not None:
+                return source
+            if not owned:
+                owned.append(VideoFileClip(video_path))
+            return owned[0]
+        
+        try:
+            for done, idx in enumerate(order, start=1):
+                clip_paths[idx] = self._render_clip(
+                    video_path, moments[idx], self._clip_output_path(idx), smart_crop, add_captions, cut_mode,
+                    encoder_threads, profile, open_source
+                )
+                progress_callback(done, len(order))
             
-            # Write output (without verbose parameters for compatibility)
-            clip.write_videofile(
-                str(output_path),
-                codec='libx264',
-                audio_codec='aac',
-                fps=24
-            )
+            return clip_paths
             
-            # Cleanup
-            clip.close()
-            video.close()
+        except Exception as e:
+            print(f"Error creating clips: {str(e)}")
+            raise
             
-            return str(output_path)
+        finally:
+            for video in owned:
+                video.close()
+    
+    def _create_clips_parallel(self, video_path, moments, order, smart_crop, add_captions, cut_mode,
+                               progress_callback, workers, encoder_threads, profile):
+        """
+        Render clips in a bounded process pool
+        
+        Args:
+            video_path: Path to source video
+            moments: List of moment dictionaries
+            order: Moment indices in submission order
+            smart_crop: Whether to crop to vertical format
+            add_captions: Whether to add captions
+            cut_mode: See create_clip
+            progress_callback: Callable(done, total) after each clip
+            workers: Number of render processes
+            encoder_threads: Encoder threads per clip
+            profile: Render profile settings
+            
+        Returns:
+            List of clip paths indexed like moments, None for moments not in order
+        """
+        clip_paths = [None] * len(moments)
+        
+        try:
+            # spawn: forked children would inherit the parent's open ffmpeg readers
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_render_worker,
+                initargs=(str(self.output_dir), self.analysis_proxies, self.frame_sizes)
+            ) as pool:
+                futures = {
+                    pool.submit(
+                        _render_clip_in_worker,
+                        video_path, moments[idx], idx, smart_crop, add_captions, cut_mode, encoder_threads,
+                        profile
+                    ): idx
+                    for idx in order
+                }
+                
+                # Progress as clips finish; results are placed back in moment order
+                for done, future in enumerate(as_completed(futures), start=1):
+                    clip_paths[futures[future]] = future.result()
+                    progress_callback(done, len(order))
+            
+            return clip_paths
             
         except Exception as e:
-            print(f"Error creating clip: {str(e)}")
+            print(f"Error creating clips: {str(e)}")
             raise
     
+    def _cache_key(self, video_path, moment, smart_crop, add_captions, cut_mode, profile):
+        """
+        Clip cache key for a moment and its render options
+        
+        Args:
+            video_path: Path to source video
+            moment: Moment dictionary with start/end times
+            smart_crop: Whether to crop to vertical format
+            add_captions: Whether to add captions
+            cut_mode: See create_clip
+            profile: Render profile settings
+            
+        Returns:
+            Key string, or None when the source can't be fingerprinted
+        """
+        try:
+            return self.clip_cache.key(video_path, moment, {
+                'smart_crop': bool(smart_crop),
+                'face_tracking': bool(smart_crop and self.mediapipe_available),
+                'caption': moment.get('hook') if add_captions else None,
+                'cut_mode': cut_mode,
+                'profile': profile
+            })
+        except Exception as e:
+            print(f"Clip cache unavailable: {str(e)}")
+            return None
+    
+    def _cache_store(self, cache_key, clip_path):
+        """
+        Add a rendered clip to the clip cache, ignoring cache errors
+        
+        Args:
+            cache_key: Key from _cache_key
+            clip_path: Rendered clip
+        """
+        try:
+            self.clip_cache.store(cache_key, clip_path)
+        except Exception as e:
+            print(f"Could not cache clip: {str(e)}")
+    
+    def _clip_output_path(self, clip_index):
+        """
+        Output path for a clip
+        
+        Args:
+            clip_index: Index of this clip
+            
+        Returns:
+            Path to the clip file
+        """
+        # Create output directory
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Unlink rather than overwrite: the old file may be a hard link into the clip cache
+        output_path = self.output_dir / f"clip_{clip_index + 1}.mp4"
+        output_path.unlink(missing_ok=True)
+        
+        return output_path
+    
+    def _render_clip(self, video_path, moment, output_path, smart_crop, add_captions, cut_mode, threads, profile,
+                     open_source):
+        """
+        Render one clip by the cheapest path that supports its options
+        
+        Stream copy, then the ffmpeg filter graph, then MoviePy. The clip is
+        written under a temporary name and renamed into place, so output_path
+        only ever holds a complete file.
+        
+        Args:
+            video_path: Path to source video
+            moment: Moment dictionary with start/end times
+            output_path: Path for the clip
+            smart_crop: Whether to crop to vertical format
+            add_captions: Whether to add captions
+            cut_mode: See create_clip
+            threads: Encoder threads, the profile's when None
+            profile: Render profile settings
+            open_source: Callable returning an opened VideoFileClip, only
+                called when MoviePy has to render
+            
+        Returns:
+            Path to the clip
+        """
+        with atomic_output(output_path) as partial_path:
+            clip_path = self._fast_cut(
+                video_path, moment, partial_path, smart_crop, add_captions, cut_mode, threads
+            ) or self._filter_render(
+                video_path, moment, partial_path, smart_crop, add_captions, threads, profile
+            )
+            
+            if not clip_path:
+                self._render_moment(open_source(), moment, partial_path, smart_crop, add_captions, threads, profile)
+        
+        return str(output_path)
+    
+    def _fast_cut(self, video_path, moment, output_path, smart_crop, add_captions, cut_mode, threads=None):
+        """
+        Cut with stream copy when there is nothing to composite
+        
+        Args:
+            video_path: Path to source video
+            moment: Moment dictionary with start/end times
+            output_path: Path for the clip
+            smart_crop: Whether to crop to vertical format
+            add_captions: Whether to add captions
+            cut_mode: See create_clip
+            threads: Encoder threads for a smart cut's re-encoded head
+            
+        Returns:
+            Path to the clip, or None when the clip needs a full render
+        """
+        needs_effects = smart_crop or (add_captions and moment.get('hook'))
+        if needs_effects or cut_mode not in ('smart', 'keyframe'):
+            return None
+        
+        # Copy packets instead of decoding every frame
+        try:
+            if cut_mode == 'smart':
+                clip_path, _ = fast_cut.smart_cut(
+                    video_path, moment['start_time'], moment['end_time'], output_path, threads=threads
+                )
+            else:
+                clip_path, _ = fast_cut.keyframe_cut(video_path, moment['start_time'], moment['end_time'], output_path)
+            return clip_path
+        except Exception as e:
+            print(f"Stream-copy cut failed, re-encoding instead: {str(e)}")
+            return None
+    
+    def _filter_render(self, video_path, moment, output_path, smart_crop, add_captions, threads=None, profile=None):
+        """
+        Render crop and captions with one ffmpeg filter graph
+        
+        Args:
+            video_path: Path to source video
+            moment: Moment dictionary with start/end times
+            output_path: Path for the clip
+            smart_crop: Whether to crop to vertical format
+            add_captions: Whether to add captions
+            threads: Encoder threads, the profile's when None
+            profile: Render profile settings, default profile when None
+            
+        Returns:
+            Path to the clip, or None when MoviePy should render it instead
+        """
+        caption = moment.get('hook') if add_captions else None
+        
+        try:
+            frame_size = self._frame_size(video_path)
+            crop_track = None
+            if smart_crop:
+                crop_track = self._face_track(video_path, moment, frame_size)
+            
+            return fast_cut.render_clip(
+                video_path,
+                moment['start_time'],
+                moment['end_time'],
+                output_path,
+                vertical=smart_crop,
+                caption=caption,
+                threads=threads,
+                profile=profile,
+                crop_track=crop_track,
+                frame_size=frame_size
+            )
+        except Exception as e:
+            print(f"Filter-graph render failed, falling back to MoviePy: {str(e)}")
+            return None
+    
+    def _render_moment(self, video, moment, output_path, smart_crop, add_captions, threads=None, profile=None):
+        """
+        Render one moment from an opened source through MoviePy
+        
+        Derived clips share the source's reader, so they are not closed here;
+        closing them would close the reader for every other moment.
+        
+        Args:
+            video: Opened VideoFileClip
+            moment: Moment dictionary with start/end times
+            output_path: Path for the clip
+            smart_crop: Whether to crop to vertical format
+            add_captions: Whether to add captions
+            threads: Encoder threads, the profile's when None
+            profile: Render profile settings, default profile when None
+        """
+        profile = profile or render_profiles.get_render_profile()
+        
+        # Extract subclip
+        start_time = moment['start_time']
+        end_time = min(moment['end_time'], video.duration)
+        
+        # Use subclipped for newer moviepy versions, fallback to subclip
+        try:
+            clip = video.subclipped(start_time, end_time)
+        except AttributeError:
+            clip = video.subclip(start_time, end_time)
+        
+        # Smart crop to vertical if enabled, following the speaker when a face is found
+        if smart_crop:
+            crop_track = self._face_track(video.filename, moment, video.size)
+            if crop_track is None:
+                clip = self._crop_to_vertical_centered(clip)
+            else:
+                clip = self._crop_to_vertical_tracked(clip, crop_track)
+        
+        # Downscale before captioning so the caption is sized for the output
+        clip = render_profiles.fit_height(clip, profile)
+        
+        # Add captions if enabled
+        if add_captions and moment.get('hook'):
+            clip = self._add_caption_overlay(clip, moment['hook'])
+        
+        # Write output (without verbose parameters for compatibility)
+        clip.write_videofile(
+            str(output_path),
+            fps=24,
+            **render_profiles.moviepy_write_params(profile, threads)
+        )
+    
+    def _face_track(self, video_path, moment, frame_size):
+        """
+        Plan a face-following vertical crop for a moment
+        
+        Reads the source's analysis proxy when one was given, so detection
+        never decodes full-resolution frames.
+        
+        Args:
+            video_path: Path to source video
+            moment: Moment dictionary with start/end times
+            frame_size: Source (width, height)
+            
+        Returns:
+            smart_crop.track_crop path, or None to crop the center
+        """
+        if not self.mediapipe_available:
+            return None
+        
+        try:
+            analysis_path = self.analysis_proxies.get(video_path)
+            if analysis_path:
+                # Same aspect ratio and timeline as the source, fewer pixels
+                frame_size = self._frame_size(analysis_path)
+            
+            return face_crop.track_crop(
+                analysis_path or video_path, moment['start_time'], moment['end_time'], tuple(frame_size)
+            )
+        except Exception as e:
+            print(f"Face tracking failed, cropping the center: {str(e)}")
+            return None
+    
+    def _frame_size(self, video_path):
+        """
+        Frame size of a video, probed only the first time it is asked for
+        
+        Args:
+            video_path: Path to a video
+            
+        Returns:
+            Tuple of (width, height)
+        """
+        if video_path not in self.frame_sizes:
+            self.frame_sizes[video_path] = fast_cut.probe_video_size(video_path)
+        return self.frame_sizes[video_path]
+    
+    def _crop_to_vertical_tracked(self, clip, crop_track):
+        """
+        Crop video to vertical (9:16) format along a face track
+        
+        Args:
+            clip: MoviePy clip starting at the moment's start
+            crop_track: smart_crop.track_crop path
+            
+        Returns:
+            Cropped clip
+        """
+        width, height = clip.size
+        target_width = int(height * 9 / 16)
+        target_width -= target_width % 2
+        
+        def crop_frame(get_frame, t):
+            x = face_crop.crop_left_edges(crop_track, [t], width, target_width)[0]
+            return get_frame(t)[:, x:x + target_width]
+        
+        return clip.transform(crop_frame)
+    
     def _crop_to_vertical_centered(self, clip):
         """
         Crop video to vertical (9:16) format, centered on content
@@ -301,25 +1102,15 @@ IMPORTANT:
             Clip with caption overlay
         """
         try:
-            # Create text clip
-            txt_clip = TextClip(
-                text,
-                fontsize=40,
-                color='white',
-                font='Arial-Bold',
-                stroke_color='black',
-                stroke_width=2,
-                method='caption',
-                size=(clip.w * 0.9, None)
-            )
-            
-            # Position at bottom
-            txt_clip = txt_clip.set_position(('center', 'bottom')).set_duration(clip.duration)
+            # Rasterized once per (text, font, size, width) and reused across clips
+            premultiplied, inverse_alpha = _caption_tile(text, 'Arial-Bold', 40, int(clip.w * 0.9))
             
-            # Composite
-            final_clip = CompositeVideoClip([clip, txt_clip])
+            # Bottom center
+            x = (clip.w - premultiplied.shape[1]) // 2
+            y = clip.h - premultiplied.shape[0]
             
-            return final_clip
+            # Blend only the caption's bounding box into each frame
+            return clip.image_transform(lambda frame: _blend_tile(frame, premultiplied, inverse_alpha, x, y))
             
         except Exception as e:
             print(f"Error adding caption: {str(e)}")
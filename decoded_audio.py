@@ -0,0 +1,153 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import librosa
+import soundfile as sf
+import soxr
+
+
+class DecodedAudio:
+    """Audio decoded once per job and shared by every analysis step"""
+    
+    # Whisper and most speech models work on 16 kHz mono
+    ANALYSIS_SR = 16000
+    
+    def __init__(self, samples, sr, source_path=None, mmap_dir=None):
+        """
+        Wrap already decoded mono samples
+        
+        Args:
+            samples: Mono float32 samples at the native rate (array or memmap)
+            sr: Native sample rate
+            source_path: Optional path the samples were decoded from
+            mmap_dir: Directory backing memory-mapped views, removed on close
+        """
+        self.samples = samples
+        self.sr = sr
+        self.source_path = source_path
+        self.mmap_dir = mmap_dir
+        self._mono_16k = None
+    
+    @classmethod
+    def from_file(cls, audio_path, mmap=False, block_duration=30.0):
+        """
+        Decode an audio file once
+        
+        Args:
+            audio_path: Path to audio file
+            mmap: Decode into a memory-mapped file instead of process memory
+            block_duration: Seconds of audio decoded per block when mmap is set
+            
+        Returns:
+            DecodedAudio instance
+        """
+        if not mmap:
+            y, sr = librosa.load(audio_path, sr=None)
+            return cls(y, sr, source_path=audio_path)
+        
+        try:
+            info = sf.info(audio_path)
+            mmap_dir = tempfile.mkdtemp(prefix="pulsepoint_audio_")
+            native_path = os.path.join(mmap_dir, "native.npy")
+            
+            # Fill the memmap block by block so the waveform never sits in RAM
+            samples = np.lib.format.open_memmap(native_path, mode='w+', dtype=np.float32, shape=(info.frames,))
+            blocksize = max(1, int(block_duration * info.samplerate))
+            offset = 0
+            for block in sf.blocks(audio_path, blocksize=blocksize, dtype='float32', always_2d=True):
+                mono = block.mean(axis=1, dtype=np.float32)
+                samples[offset:offset + len(mono)] = mono
+                offset += len(mono)
+            samples.flush()
+            del samples
+            
+            samples = np.load(native_path, mmap_mode='r')
+            return cls(samples, info.samplerate, source_path=audio_path, mmap_dir=mmap_dir)
+        
+        except Exception as e:
+            raise Exception(f"Failed to decode audio: {str(e)}")
+    
+    @property
+    def native(self):
+        """Mono samples at the native sample rate"""
+        return self.samples
+    
+    @property
+    def mono_16k(self):
+        """Mono samples resampled to ANALYSIS_SR, computed once on first use"""
+        if self._mono_16k is None:
+            if self.sr == self.ANALYSIS_SR:
+                self._mono_16k = self.samples
+            elif self.mmap_dir:
+                self._mono_16k = self._resample_to_mmap(os.path.join(self.mmap_dir, "mono_16k.npy"))
+            else:
+                self._mono_16k = librosa.resample(
+                    np.asarray(self.samples),
+                    orig_sr=self.sr,
+                    target_sr=self.ANALYSIS_SR
+                ).astype(np.float32, copy=False)
+        
+        return self._mono_16k
+    
+    def _resample_to_mmap(self, path, block_duration=30.0):
+        """
+        Resample the native samples to ANALYSIS_SR block by block into a memory-mapped file
+        
+        A streaming resampler carries its filter state across blocks, so the
+        result matches a one-shot resample without loading the whole signal.
+        
+        Args:
+            path: .npy path for the resampled samples
+            block_duration: Seconds of native audio resampled per block
+            
+        Returns:
+            Read-only memmap of the resampled samples
+        """
+        stream = soxr.ResampleStream(self.sr, self.ANALYSIS_SR, 1, dtype='float32', quality='HQ')
+        capacity = int(np.ceil(len(self.samples) * self.ANALYSIS_SR / self.sr)) + 1
+        resampled = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(capacity,))
+        
+        filled = 0
+        blocksize = max(1, int(block_duration * self.sr))
+        n_blocks = max(1, -(-len(self.samples) // blocksize))
+        for idx, block in enumerate(self.blocks(blocksize)):
+            chunk = stream.resample_chunk(block.astype(np.float32, copy=False), last=idx == n_blocks - 1)
+            chunk = chunk[:capacity - filled]
+            resampled[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+        
+        resampled.flush()
+        del resampled
+        return np.load(path, mmap_mode='r')[:filled]
+    
+    @property
+    def duration(self):
+        """Duration in seconds"""
+        return len(self.samples) / float(self.sr)
+    
+    def blocks(self, blocksize):
+        """
+        Iterate over the native samples in fixed-size blocks
+        
+        Args:
+            blocksize: Samples per block
+            
+        Yields:
+            Mono float32 sample blocks
+        """
+        for start in range(0, len(self.samples), blocksize):
+            yield np.asarray(self.samples[start:start + blocksize])
+    
+    def close(self):
+        """Drop decoded views and remove any memory-mapped backing files"""
+        self.samples = None
+        self._mono_16k = None
+        
+        if self.mmap_dir:
+            shutil.rmtree(self.mmap_dir, ignore_errors=True)
+            self.mmap_dir = None
+    
+    def __del__(self):
+        """Destructor to ensure backing files are removed"""
+        self.close()
@@ -1,13 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import librosa
-import whisper
+import soundfile as sf
 from scipy.signal import find_peaks
 from moviepy import VideoFileClip
+from decoded_audio import DecodedAudio
+from keyword_index import KeywordIndex
+from parallel_transcription import transcribe_chunked
+from transcription_backends import get_backend
 
 
 class EmotionDetector:
     """Detects emotional peaks in audio using volume analysis and transcription"""
     
+    # Row order of the feature matrix returned by analyze_audio_features
+    FEATURE_NAMES = ('rms', 'zcr', 'spectral_centroid', 'spectral_bandwidth', 'spectral_rolloff', 'onset_strength')
+    
     def __init__(self, sensitivity=0.6):
         """
         Initialize the emotion detector
@@ -17,30 +25,141 @@ class EmotionDetector:
         """
         self.sensitivity = sensitivity
         self.whisper_model = None
+        self.keyword_index = None
+        
+        # (times, normalized RMS) from the last detect_peaks, for moment_ranker
+        self.energy_envelope = None
     
-    def detect_peaks(self, audio_path, video_path=None):
+    def detect_peaks(self, audio_path, video_path=None, streaming=True, block_duration=30.0):
         """
         Detect emotional peaks in audio using amplitude analysis
         
         Args:
-            audio_path: Path to audio file
+            audio_path: Path to audio file or a DecodedAudio shared by the job
             video_path: Optional path to video for additional analysis
+            streaming: Read audio in blocks so memory stays flat for long inputs
+            block_duration: Block length in seconds when streaming
             
         Returns:
             List of peak timestamps with scores
         """
-        # Load audio
-        y, sr = librosa.load(audio_path, sr=None)
-        
-        # Calculate RMS energy (loudness) over time
         hop_length = 512
-        rms = librosa.feature.rms(y=y, hop_length=hop_length)[0]
         
+        rms, sr = None, None
+        if isinstance(audio_path, DecodedAudio):
+            # Already decoded; walk it in blocks so memmapped audio stays paged out
+            blocksize = hop_length * max(1, int(np.ceil(block_duration * audio_path.sr / hop_length)))
+            rms = self._rms_envelope_from_blocks(audio_path.blocks(blocksize), hop_length)
+            sr = audio_path.sr
+        elif streaming:
+            try:
+                rms, sr = self._stream_rms_envelope(audio_path, hop_length, block_duration=block_duration)
+            except Exception as e:
+                # soundfile can't read every container (e.g. mp3 on old libsndfile)
+                print(f"Streaming audio read failed, loading whole file: {str(e)}")
+        
+        if rms is None:
+            # Load audio
+            y, sr = librosa.load(audio_path, sr=None)
+            
+            # Calculate RMS energy (loudness) over time
+            rms = librosa.feature.rms(y=y, hop_length=hop_length)[0]
+        
+        return self._find_envelope_peaks(rms, sr, hop_length)
+    
+    def _stream_rms_envelope(self, audio_path, hop_length=512, frame_length=2048, block_duration=30.0):
+        """
+        Build the RMS envelope block by block without holding the waveform
+        
+        Framing matches librosa.feature.rms with center=True, so the envelope
+        is the same as the one computed on the fully loaded signal.
+        
+        Args:
+            audio_path: Path to audio file
+            hop_length: Samples between frames
+            frame_length: Samples per analysis frame
+            block_duration: Seconds of audio read per block
+            
+        Returns:
+            Tuple of (rms envelope, sample rate)
+        """
+        sr = sf.info(audio_path).samplerate
+        blocksize = hop_length * max(1, int(np.ceil(block_duration * sr / hop_length)))
+        
+        # Downmix to mono the same way librosa.load does
+        blocks = (
+            block.mean(axis=1, dtype=np.float32)
+            for block in sf.blocks(audio_path, blocksize=blocksize, dtype='float32', always_2d=True)
+        )
+        
+        return self._rms_envelope_from_blocks(blocks, hop_length, frame_length), sr
+    
+    def _rms_envelope_from_blocks(self, blocks, hop_length=512, frame_length=2048):
+        """
+        Build a centered RMS envelope from consecutive mono sample blocks
+        
+        Args:
+            blocks: Iterable of mono float32 sample arrays
+            hop_length: Samples between frames
+            frame_length: Samples per analysis frame
+            
+        Returns:
+            RMS envelope
+        """
+        # Zero padding at both ends, as librosa does for centered frames
+        pad = np.zeros(frame_length // 2, dtype=np.float32)
+        carry = pad
+        envelope = []
+        
+        for block in blocks:
+            buf = np.concatenate([carry, block])
+            carry = self._append_rms_frames(buf, envelope, hop_length, frame_length)
+        
+        self._append_rms_frames(np.concatenate([carry, pad]), envelope, hop_length, frame_length)
+        
+        return np.concatenate(envelope) if envelope else np.zeros(0, dtype=np.float32)
+    
+    @staticmethod
+    def _append_rms_frames(buf, envelope, hop_length, frame_length):
+        """
+        Append RMS values for every full frame in buf and return the unused tail
+        
+        Args:
+            buf: Mono float32 samples, starting on a frame boundary
+            envelope: List collecting RMS arrays
+            hop_length: Samples between frames
+            frame_length: Samples per analysis frame
+            
+        Returns:
+            Samples still needed by the next frame
+        """
+        if len(buf) < frame_length:
+            return buf
+        
+        n_frames = 1 + (len(buf) - frame_length) // hop_length
+        frames = np.lib.stride_tricks.sliding_window_view(buf, frame_length)[::hop_length][:n_frames]
+        envelope.append(np.sqrt(np.mean(np.abs(frames) ** 2, axis=1)))
+        
+        return buf[n_frames * hop_length:]
+    
+    def _find_envelope_peaks(self, rms, sr, hop_length):
+        """
+        Pick emotional peaks from an RMS envelope
+        
+        Args:
+            rms: RMS energy per frame
+            sr: Sample rate of the analysed audio
+            hop_length: Samples between frames
+            
+        Returns:
+            List of peak timestamps with scores, highest score first
+        """
         # Calculate times for each frame
         times = librosa.frames_to_time(np.arange(len(rms)), sr=sr, hop_length=hop_length)
         
         # Normalize RMS values
         rms_normalized = (rms - np.min(rms)) / (np.max(rms) - np.min(rms) + 1e-8)
+        self.energy_envelope = (times, rms_normalized)
         
         # Find peaks in RMS energy
         # Adjust threshold based on sensitivity
@@ -71,74 +190,302 @@ class EmotionDetector:
         
         return emotional_peaks
     
-    def analyze_audio_features(self, audio_path):
+    def analyze_audio_features(self, audio_path, n_fft=2048, block_frames=4096, max_workers=4):
         """
         Analyze additional audio features for emotion detection
         
+        One STFT is computed, in blocks of frames spread over a thread pool,
+        and every spectral feature plus the beat tracker's onset envelope is
+        derived from that shared magnitude. RMS and ZCR run in the same pool.
+        
         Args:
-            audio_path: Path to audio file
+            audio_path: Path to audio file or a DecodedAudio shared by the job
+            n_fft: FFT size of the shared STFT
+            block_frames: STFT frames per block (bounds spectrogram memory)
+            max_workers: Thread pool size
             
         Returns:
-            Dictionary of audio features over time
+            Dictionary of audio features over time; 'features' holds them all
+            as one float32 matrix (FEATURE_NAMES x frames) on the 'times' axis
         """
-        y, sr = librosa.load(audio_path, sr=None)
+        if isinstance(audio_path, DecodedAudio):
+            y, sr = np.asarray(audio_path.native), audio_path.sr
+        else:
+            y, sr = librosa.load(audio_path, sr=None)
         
         # Calculate various features
         hop_length = 512
+        n_frames = 1 + len(y) // hop_length
+        mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft)
         
-        # Energy/Loudness
-        rms = librosa.feature.rms(y=y, hop_length=hop_length)[0]
-        
-        # Zero crossing rate (can indicate voice vs silence)
-        zcr = librosa.feature.zero_crossing_rate(y, hop_length=hop_length)[0]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # Energy/Loudness
+            rms_future = pool.submit(librosa.feature.rms, y=y, hop_length=hop_length)
+            
+            # Zero crossing rate (can indicate voice vs silence)
+            zcr_future = pool.submit(librosa.feature.zero_crossing_rate, y, hop_length=hop_length)
+            
+            # Spectral features, one shared STFT computed block by block
+            block_futures = [
+                pool.submit(self._spectral_block, y, sr, start, min(start + block_frames, n_frames), n_fft, hop_length, mel_basis)
+                for start in range(0, n_frames, block_frames)
+            ]
+            
+            rms = rms_future.result()[0]
+            zcr = zcr_future.result()[0]
+            blocks = [future.result() for future in block_futures]
         
-        # Spectral centroid (brightness of sound)
-        spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr, hop_length=hop_length)[0]
+        spectral_centroid = np.concatenate([block['spectral_centroid'] for block in blocks])
+        spectral_bandwidth = np.concatenate([block['spectral_bandwidth'] for block in blocks])
+        spectral_rolloff = np.concatenate([block['spectral_rolloff'] for block in blocks])
+        mel = np.concatenate([block['mel'] for block in blocks], axis=1)
         
-        # Tempo/Beat
-        tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
+        # Tempo/Beat, from the same spectrogram instead of a second STFT
+        onset_strength = librosa.onset.onset_strength(
+            S=librosa.power_to_db(mel),
+            sr=sr,
+            n_fft=n_fft,
+            hop_length=hop_length,
+            aggregate=np.median
+        )
+        tempo, beat_frames = librosa.beat.beat_track(onset_envelope=onset_strength, sr=sr, hop_length=hop_length)
         
         times = librosa.frames_to_time(np.arange(len(rms)), sr=sr, hop_length=hop_length)
         
+        features = np.vstack([
+            rms,
+            zcr,
+            spectral_centroid,
+            spectral_bandwidth,
+            spectral_rolloff,
+            onset_strength
+        ]).astype(np.float32)
+        
         return {
             'times': times,
-            'rms': rms,
-            'zcr': zcr,
-            'spectral_centroid': spectral_centroid,
+            'rms': features[0],
+            'zcr': features[1],
+            'spectral_centroid': features[2],
+            'spectral_bandwidth': features[3],
+            'spectral_rolloff': features[4],
+            'onset_strength': features[5],
             'tempo': tempo,
-            'beat_frames': beat_frames
+            'beat_frames': beat_frames,
+            'features': features,
+            'feature_names': self.FEATURE_NAMES
         }
     
-    def transcribe_audio(self, audio_path, model_size='base'):
+    @staticmethod
+    def _spectral_block(y, sr, start_frame, end_frame, n_fft, hop_length, mel_basis):
         """
-        Transcribe audio using OpenAI Whisper
+        Compute spectral features for a range of centered STFT frames
         
         Args:
-            audio_path: Path to audio file
+            y: Mono samples
+            sr: Sample rate
+            start_frame: First frame of the block
+            end_frame: Frame after the last one in the block
+            n_fft: FFT size
+            hop_length: Samples between frames
+            mel_basis: Mel filterbank for the onset envelope
+            
+        Returns:
+            Dictionary of per-frame spectral features for the block
+        """
+        # Samples covered by these frames, in the zero-padded centered signal
+        pad = n_fft // 2
+        seg_start = start_frame * hop_length - pad
+        seg_end = (end_frame - 1) * hop_length + n_fft - pad
+        
+        segment = y[max(seg_start, 0):min(seg_end, len(y))]
+        segment = np.pad(segment, (max(0, -seg_start), max(0, seg_end - len(y))))
+        
+        S = np.abs(librosa.stft(segment, n_fft=n_fft, hop_length=hop_length, center=False))
+        
+        # Spectral centroid (brightness of sound)
+        centroid = librosa.feature.spectral_centroid(S=S, sr=sr, n_fft=n_fft)
+        
+        return {
+            'spectral_centroid': centroid[0],
+            'spectral_bandwidth': librosa.feature.spectral_bandwidth(S=S, sr=sr, n_fft=n_fft, centroid=centroid)[0],
+            'spectral_rolloff': librosa.feature.spectral_rolloff(S=S, sr=sr, n_fft=n_fft)[0],
+            'mel': mel_basis @ (S ** 2)
+        }
+    
+    def detect_speech_regions(self, audio_path, min_speech=0.25, min_silence=0.5, padding=0.2, energy_margin_db=12.0):
+        """
+        Find speech regions from the RMS/ZCR envelope (energy-based VAD)
+        
+        Frames are speech when their energy clears an adaptive threshold above
+        the noise floor; quieter frames with a high zero-crossing rate (unvoiced
+        consonants) count as speech too. Short gaps are bridged and short
+        bursts dropped.
+        
+        Args:
+            audio_path: Path to audio file or a DecodedAudio shared by the job
+            min_speech: Shortest region kept, in seconds
+            min_silence: Shortest gap that splits two regions, in seconds
+            padding: Seconds added around each region
+            energy_margin_db: Threshold height above the noise floor
+            
+        Returns:
+            List of (start, end) tuples in seconds
+        """
+        y, sr = self._analysis_audio(audio_path)
+        return self._speech_regions(y, sr, min_speech, min_silence, padding, energy_margin_db)
+    
+    def _speech_regions(self, y, sr, min_speech=0.25, min_silence=0.5, padding=0.2, energy_margin_db=12.0):
+        """
+        Speech regions of already loaded samples, see detect_speech_regions
+        
+        Args:
+            y: Mono samples
+            sr: Sample rate
+            min_speech: Shortest region kept, in seconds
+            min_silence: Shortest gap that splits two regions, in seconds
+            padding: Seconds added around each region
+            energy_margin_db: Threshold height above the noise floor
+            
+        Returns:
+            List of (start, end) tuples in seconds
+        """
+        if len(y) == 0:
+            return []
+        
+        # 25 ms frames every 10 ms, the usual VAD resolution
+        frame_length = int(0.025 * sr)
+        hop_length = int(0.010 * sr)
+        frame_time = hop_length / float(sr)
+        
+        rms = librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0]
+        zcr = librosa.feature.zero_crossing_rate(y, frame_length=frame_length, hop_length=hop_length)[0]
+        
+        rms_db = librosa.amplitude_to_db(rms, ref=1.0)
+        noise_floor = np.percentile(rms_db, 10)
+        threshold = max(noise_floor + energy_margin_db, np.max(rms_db) - 45.0)
+        
+        voiced = rms_db > threshold
+        unvoiced = (rms_db > threshold - 10.0) & (zcr > 0.25)
+        is_speech = voiced | unvoiced
+        
+        # Bridge short pauses, then drop bursts too short to be speech
+        regions = []
+        for start, end in self._runs(is_speech):
+            start_t, end_t = float(start * frame_time), float(end * frame_time)
+            if regions and start_t - regions[-1][1] < min_silence:
+                regions[-1] = (regions[-1][0], end_t)
+            else:
+                regions.append((start_t, end_t))
+        
+        duration = len(y) / float(sr)
+        padded = []
+        for start_t, end_t in regions:
+            if end_t - start_t < min_speech:
+                continue
+            start_t, end_t = max(0.0, start_t - padding), min(duration, end_t + padding)
+            if padded and start_t <= padded[-1][1]:
+                padded[-1] = (padded[-1][0], end_t)
+            else:
+                padded.append((start_t, end_t))
+        
+        return padded
+    
+    @staticmethod
+    def _runs(mask):
+        """
+        Contiguous True runs of a boolean array
+        
+        Args:
+            mask: 1-D boolean array
+            
+        Returns:
+            List of (start, end) index pairs, end exclusive
+        """
+        edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+        return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+    
+    @staticmethod
+    def _analysis_audio(audio_path):
+        """
+        16 kHz mono samples for speech analysis and Whisper
+        
+        Args:
+            audio_path: Path to audio file or a DecodedAudio shared by the job
+            
+        Returns:
+            Tuple of (samples, sample rate)
+        """
+        if isinstance(audio_path, DecodedAudio):
+            return np.asarray(audio_path.mono_16k, dtype=np.float32), DecodedAudio.ANALYSIS_SR
+        
+        y, sr = librosa.load(audio_path, sr=DecodedAudio.ANALYSIS_SR)
+        return y, sr
+    
+    def transcribe_audio(self, audio_path, model_size='base', device=None, vad=False, workers=1, chunk_duration=300.0,
+                         backend='whisper'):
+        """
+        Transcribe audio using Whisper
+        
+        Args:
+            audio_path: Path to audio file or a DecodedAudio shared by the job
             model_size: Whisper model size ('tiny', 'base', 'small', 'medium', 'large')
+            device: Device to run on, defaults to CUDA when available
+            vad: Transcribe only detected speech regions; timestamps are mapped
+                back to source time
+            workers: Worker processes; above 1 the audio is split into
+                overlapping chunks at quiet points and transcribed in parallel
+            chunk_duration: Target chunk length in seconds when workers > 1
+            backend: Transcription engine ('whisper', or 'faster-whisper' for the
+                int8 CTranslate2 engine)
             
         Returns:
             Transcription with timestamps
         """
         try:
-            # Load Whisper model (cached after first load)
-            if self.whisper_model is None:
-                print(f"Loading Whisper model ({model_size})...")
-                self.whisper_model = whisper.load_model(model_size)
+            # Hand Whisper the shared 16 kHz view so it skips its own ffmpeg decode
+            audio = audio_path
+            if isinstance(audio_path, DecodedAudio):
+                audio = np.asarray(audio_path.mono_16k, dtype=np.float32)
+            
+            time_map = None
+            if vad:
+                audio, time_map = self._gate_speech(audio_path)
             
-            # Transcribe (without verbose parameter for compatibility)
-            result = self.whisper_model.transcribe(
-                audio_path,
-                word_timestamps=True
-            )
+            if workers > 1:
+                # Chunks go to worker processes, each with its own model
+                if isinstance(audio, str):
+                    audio, _ = self._analysis_audio(audio)
+                result = transcribe_chunked(
+                    audio,
+                    model_size=model_size,
+                    device=device,
+                    workers=workers,
+                    chunk_duration=chunk_duration,
+                    sr=DecodedAudio.ANALYSIS_SR,
+                    backend=backend
+                )
+            else:
+                # Models come from process-wide pools, so they load once per process per size
+                engine = get_backend(backend)
+                self.whisper_model = engine.load(model_size, device)
+                result = engine.transcribe(self.whisper_model, audio)
             
             # Extract segments with timestamps
+            to_source = self._source_time if time_map is not None else (lambda t, _: t)
             segments = []
             for segment in result['segments']:
                 segments.append({
-                    'start': segment['start'],
-                    'end': segment['end'],
-                    'text': segment['text'].strip()
+                    'start': to_source(segment['start'], time_map),
+                    'end': to_source(segment['end'], time_map),
+                    'text': segment['text'].strip(),
+                    'words': [
+                        {
+                            'word': word['word'].strip(),
+                            'start': to_source(word['start'], time_map),
+                            'end': to_source(word['end'], time_map)
+                        }
+                        for word in segment.get('words', [])
+                    ]
                 })
             
             return {
@@ -155,13 +502,72 @@ class EmotionDetector:
                 'language': 'unknown'
             }
     
-    def find_keyword_moments(self, transcript, keywords):
+    def _gate_speech(self, audio_path, gap=0.3):
+        """
+        Concatenate detected speech regions into one 16 kHz array
+        
+        Args:
+            audio_path: Path to audio file or a DecodedAudio shared by the job
+            gap: Seconds of silence kept between regions so Whisper sees a pause
+            
+        Returns:
+            Tuple of (gated samples, time map); the time map is an (N, 3) array of
+            (gated start, source start, source end) per region, or None if
+            nothing was cut
+        """
+        y, sr = self._analysis_audio(audio_path)
+        regions = self._speech_regions(y, sr)
+        
+        # Nothing to gain (or nothing found): transcribe everything
+        speech = sum(end - start for start, end in regions)
+        if not regions or speech >= 0.95 * len(y) / sr:
+            return y, None
+        
+        silence = np.zeros(int(gap * sr), dtype=np.float32)
+        pieces = []
+        time_map = []
+        gated_pos = 0
+        
+        for start, end in regions:
+            piece = y[int(start * sr):int(end * sr)]
+            time_map.append((gated_pos / sr, start, end))
+            pieces.extend([piece, silence])
+            gated_pos += len(piece) + len(silence)
+        
+        print(f"VAD kept {speech:.0f}s of {len(y) / sr:.0f}s audio for transcription")
+        
+        return np.concatenate(pieces), np.array(time_map)
+    
+    @staticmethod
+    def _source_time(t, time_map):
+        """
+        Map a time in the gated audio back to the source timeline
+        
+        Args:
+            t: Seconds in the gated audio
+            time_map: Output of _gate_speech
+            
+        Returns:
+            Seconds in the source audio
+        """
+        idx = max(0, np.searchsorted(time_map[:, 0], t, side='right') - 1)
+        gated_start, source_start, source_end = time_map[idx]
+        
+        # Times inside the inserted pause snap to the end of the region
+        return float(min(source_start + (t - gated_start), source_end))
+    
+    def find_keyword_moments(self, transcript, keywords, word_level=False):
         """
         Find moments in transcript containing specific keywords
         
+        All keywords are matched in one pass per segment by a KeywordIndex that
+        is built once per keyword list. Each segment moment carries a 'hits'
+        list with word-precise times when the transcript has word timings.
+        
         Args:
             transcript: Transcription result from transcribe_audio
             keywords: List of keywords to search for
+            word_level: Return one moment per hit, spanning only the matched words
             
         Returns:
             List of moments with keyword matches
@@ -171,60 +577,175 @@ class EmotionDetector:
         if not transcript or not transcript.get('segments'):
             return keyword_moments
         
+        # Reuse the automaton while the keyword list is unchanged
+        if self.keyword_index is None or self.keyword_index.keywords != list(keywords):
+            self.keyword_index = KeywordIndex(keywords)
+        
         for segment in transcript['segments']:
-            text_lower = segment['text'].lower()
-            
-            # Check for keyword matches
-            matched_keywords = [kw for kw in keywords if kw.lower() in text_lower]
-            
-            if matched_keywords:
-                keyword_moments.append({
-                    'start': segment['start'],
-                    'end': segment['end'],
-                    'text': segment['text'],
-                    'keywords': matched_keywords,
-                    'type': 'keyword_match'
+            matches = self.keyword_index.search(segment['text'])
+            
+            if not matches:
+                continue
+            
+            word_spans = self._word_char_spans(segment)
+            
+            hits = []
+            for kw_idx, start_char, end_char in matches:
+                hit_start, hit_end = self._hit_time(segment, word_spans, start_char, end_char)
+                hits.append({
+                    'keyword': keywords[kw_idx],
+                    'start': hit_start,
+                    'end': hit_end
                 })
+            
+            if word_level:
+                for hit in hits:
+                    keyword_moments.append({
+                        'start': hit['start'],
+                        'end': hit['end'],
+                        'text': segment['text'],
+                        'keywords': [hit['keyword']],
+                        'hits': [hit],
+                        'type': 'keyword_match'
+                    })
+                continue
+            
+            # Keep keyword-list order, as the old per-keyword check did
+            matched_idx = sorted(set(kw_idx for kw_idx, _, _ in matches))
+            
+            keyword_moments.append({
+                'start': segment['start'],
+                'end': segment['end'],
+                'text': segment['text'],
+                'keywords': [keywords[i] for i in matched_idx],
+                'hits': hits,
+                'type': 'keyword_match'
+            })
         
         return keyword_moments
     
-    def combine_peaks_and_keywords(self, audio_peaks, keyword_moments, window=10):
+    @staticmethod
+    def _word_char_spans(segment):
+        """
+        Locate each timed word inside the lowercased segment text
+        
+        Args:
+            segment: Transcript segment with optional 'words'
+            
+        Returns:
+            List of (start_char, end_char, word) for words found in order
+        """
+        text_lower = segment['text'].lower()
+        spans = []
+        cursor = 0
+        
+        for word in segment.get('words', []):
+            token = word['word'].lower()
+            if not token:
+                continue
+            
+            pos = text_lower.find(token, cursor)
+            if pos < 0:
+                continue
+            
+            spans.append((pos, pos + len(token), word))
+            cursor = pos + len(token)
+        
+        return spans
+    
+    @staticmethod
+    def _hit_time(segment, word_spans, start_char, end_char):
+        """
+        Map a character range to the times of the words it overlaps
+        
+        Args:
+            segment: Transcript segment
+            word_spans: Output of _word_char_spans
+            start_char: Match start offset
+            end_char: Match end offset (exclusive)
+            
+        Returns:
+            Tuple of (start, end) seconds, the segment bounds if no word overlaps
+        """
+        overlapping = [word for ws, we, word in word_spans if ws < end_char and we > start_char]
+        
+        if not overlapping:
+            return segment['start'], segment['end']
+        
+        return overlapping[0]['start'], overlapping[-1]['end']
+    
+    def combine_peaks_and_keywords(self, audio_peaks, keyword_moments, window=10, distance_weighted=False):
         """
         Combine audio peaks and keyword moments to identify best clips
         
+        Keyword start times are sorted once and each peak's window is found by
+        binary search, so this scales as O((P + K) log K) rather than P x K.
+        
         Args:
             audio_peaks: List of audio peak moments
             keyword_moments: List of keyword match moments
             window: Time window (seconds) to consider peaks and keywords together
+            distance_weighted: Scale the boost by how close the nearest keyword is
+                instead of applying a flat 1.5x
             
         Returns:
             Combined list of high-value moments
         """
         combined_moments = []
         
-        # For each audio peak, check if there's a keyword nearby
-        for peak in audio_peaks:
-            peak_time = peak['time']
+        if not audio_peaks:
+            return combined_moments
+        
+        peak_times = np.array([peak['time'] for peak in audio_peaks], dtype=np.float64)
+        
+        # Sort keyword moments by start time for the window lookup
+        kw_starts = np.array([kw['start'] for kw in keyword_moments], dtype=np.float64)
+        order = np.argsort(kw_starts, kind='stable')
+        kw_starts = kw_starts[order]
+        
+        # Window bounds [lo, hi) of keyword moments within +/- window of each peak
+        lo = np.searchsorted(kw_starts, peak_times - window, side='left')
+        hi = np.searchsorted(kw_starts, peak_times + window, side='right')
+        
+        # Prefix counts per distinct keyword so each window's keyword set is one subtraction
+        vocab = {}
+        for kw_moment in keyword_moments:
+            for kw in kw_moment['keywords']:
+                vocab.setdefault(kw, len(vocab))
+        vocab_list = list(vocab)
+        
+        prefix = np.zeros((len(kw_starts) + 1, len(vocab)), dtype=np.int32)
+        for row, idx in enumerate(order):
+            for kw in keyword_moments[idx]['keywords']:
+                prefix[row + 1, vocab[kw]] += 1
+        np.cumsum(prefix, axis=0, out=prefix)
+        
+        present = (prefix[hi] - prefix[lo]) > 0
+        has_keywords = present.any(axis=1)
+        
+        # Boost scores for moments with keywords
+        if distance_weighted and len(kw_starts):
+            # Nearest keyword is one of the two neighbours of the insertion point
+            pos = np.searchsorted(kw_starts, peak_times)
+            left = kw_starts[np.clip(pos - 1, 0, len(kw_starts) - 1)]
+            right = kw_starts[np.clip(pos, 0, len(kw_starts) - 1)]
+            nearest = np.minimum(np.abs(peak_times - left), np.abs(right - peak_times))
+            boost = 1.0 + 0.5 * np.clip(1.0 - nearest / max(window, 1e-8), 0.0, 1.0)
+        else:
+            boost = np.full(len(peak_times), 1.5)  # Boost by 50%
+        
+        for i, peak in enumerate(audio_peaks):
             score = peak['score']
-            
-            # Check for nearby keywords
-            nearby_keywords = []
-            for kw_moment in keyword_moments:
-                if abs(kw_moment['start'] - peak_time) <= window:
-                    nearby_keywords.extend(kw_moment['keywords'])
+            if has_keywords[i]:
+                score = float(score * boost[i])
             
             combined_moments.append({
-                'time': peak_time,
+                'time': peak['time'],
                 'score': score,
-                'keywords': list(set(nearby_keywords)),
-                'has_keywords': len(nearby_keywords) > 0
+                'keywords': [vocab_list[k] for k in np.flatnonzero(present[i])],
+                'has_keywords': bool(has_keywords[i])
             })
         
-        # Boost scores for moments with keywords
-        for moment in combined_moments:
-            if moment['has_keywords']:
-                moment['score'] *= 1.5  # Boost by 50%
-        
         # Re-sort by adjusted score
         combined_moments = sorted(combined_moments, key=lambda x: x['score'], reverse=True)
         
@@ -0,0 +1,417 @@
+"""
+Fast clip extraction and rendering with ffmpeg: stream copy, smart cuts and filter graphs
+"""
+import os
+import re
+import subprocess
+import tempfile
+import numpy as np
+import imageio_ffmpeg
+import render_profiles
+import smart_crop
+
+
+def _run_ffmpeg(args):
+    """
+    Run ffmpeg and return its stderr
+    
+    Args:
+        args: Arguments after the ffmpeg binary
+        
+    Returns:
+        stderr text
+    """
+    result = subprocess.run(
+        [imageio_ffmpeg.get_ffmpeg_exe(), '-hide_banner', '-nostdin'] + args,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "ffmpeg failed")
+    return result.stderr
+
+
+def probe_keyframes(video_path, start, end):
+    """
+    List video keyframe times in a range, decoding keyframes only
+    
+    Args:
+        video_path: Path to source video
+        start: Range start in seconds
+        end: Range end in seconds
+        
+    Returns:
+        Tuple of (sorted keyframe times, stream info dict with 'codec', 'pix_fmt',
+        'fps' and 'audio_codec' (None without audio))
+    """
+    stderr = _run_ffmpeg([
+        '-skip_frame', 'nokey',
+        '-ss', f"{max(0.0, start):.3f}",
+        # Input options: with -copyts an output -t would count from zero, not start
+        '-t', f"{max(0.0, end - start):.3f}",
+        '-i', video_path,
+        '-copyts',
+        '-map', '0:v:0',
+        '-vf', 'showinfo',
+        '-an',
+        '-f', 'null', '-'
+    ])
+    
+    times = sorted(
+        float(t) for t in re.findall(r'pts_time:\s*([-\d.]+)', stderr) if start - 1e-3 <= float(t) <= end + 1e-3
+    )
+    
+    info = {'codec': None, 'pix_fmt': None, 'fps': None, 'audio_codec': None}
+    stream = re.search(r'Stream #0:\d+.*?: Video: (\w+)[^,]*, (\w+)', stderr)
+    if stream:
+        info['codec'], info['pix_fmt'] = stream.group(1), stream.group(2)
+    audio = re.search(r'Stream #0:\d+.*?: Audio: (\w+)', stderr)
+    if audio:
+        info['audio_codec'] = audio.group(1)
+    fps = re.search(r'([\d.]+) fps', stderr)
+    if fps:
+        info['fps'] = float(fps.group(1))
+    
+    return times, info
+
+
+def stream_copy(video_path, start, end, output_path):
+    """
+    Copy packets from start to end without re-encoding
+    
+    start must be a keyframe time for the output to begin cleanly.
+    
+    Args:
+        video_path: Path to source video
+        start: Start time in seconds (a keyframe)
+        end: End time in seconds
+        output_path: Path for output video file
+        
+    Returns:
+        Path to the clip
+    """
+    _run_ffmpeg([
+        '-y',
+        '-ss', f"{start:.6f}",
+        '-i', video_path,
+        '-t', f"{end - start:.6f}",
+        '-map', '0:v:0',
+        '-map', '0:a?',
+        '-c', 'copy',
+        # No timestamp shifting: the muxer's edit list keeps a B-frame source's
+        # first frame at zero instead of pushing it back by the reorder delay
+        '-movflags', '+faststart',
+        str(output_path)
+    ])
+    return str(output_path)
+
+
+def _has_frame_gap(video_path, around, fps, window=0.5):
+    """
+    Whether decoded frame times jump near a point, e.g. a concatenation seam
+    
+    Args:
+        video_path: Path to video
+        around: Time to check in seconds
+        fps: Frame rate; a jump over 1.5 frame intervals counts as a gap
+        window: Seconds checked on each side
+        
+    Returns:
+        Boolean
+    """
+    start = max(0.0, around - window)
+    stderr = _run_ffmpeg([
+        '-ss', f"{start:.3f}",
+        '-t', f"{2 * window:.3f}",
+        '-i', str(video_path),
+        '-copyts',
+        '-map', '0:v:0',
+        '-vf', 'showinfo',
+        '-an',
+        '-f', 'null', '-'
+    ])
+    
+    times = sorted(float(t) for t in re.findall(r'pts_time:\s*([-\d.]+)', stderr))
+    return any(b - a > 1.5 / fps for a, b in zip(times, times[1:]))
+
+
+def keyframe_cut(video_path, start, end, output_path, search_window=20.0):
+    """
+    Stream-copy a clip starting at the last keyframe at or before start
+    
+    The clip may start up to one GOP early so the moment itself is kept.
+    
+    Args:
+        video_path: Path to source video
+        start: Requested start time in seconds
+        end: End time in seconds
+        output_path: Path for output video file
+        search_window: Seconds before start searched for a keyframe
+        
+    Returns:
+        Tuple of (path to the clip, actual start time)
+    """
+    keyframes, _ = probe_keyframes(video_path, start - search_window, start + 0.001)
+    before = [t for t in keyframes if t <= start + 1e-3]
+    
+    # Long GOP: search from the beginning of the file
+    if not before and start > search_window:
+        keyframes, _ = probe_keyframes(video_path, 0.0, start + 0.001)
+        before = [t for t in keyframes if t <= start + 1e-3]
+    
+    cut_start = before[-1] if before else 0.0
+    return stream_copy(video_path, cut_start, end, output_path), cut_start
+
+
+def smart_cut(video_path, start, end, output_path, search_window=20.0, threads=None):
+    """
+    Re-encode only the partial GOP before the first keyframe, copy the rest
+    
+    Falls back to a keyframe cut when the source isn't H.264 with AAC (or no)
+    audio, since the re-encoded head must match the copied tail for concatenation.
+    
+    Args:
+        video_path: Path to source video
+        start: Start time in seconds
+        end: End time in seconds
+        output_path: Path for output video file
+        search_window: Seconds after start searched for the next keyframe
+        threads: Encoder threads for the re-encoded head, ffmpeg default when None
+        
+    Returns:
+        Tuple of (path to the clip, actual start time)
+    """
+    keyframes, info = probe_keyframes(video_path, start, min(end, start + search_window))
+    after = [t for t in keyframes if t >= start - 1e-3]
+    
+    if after and after[0] <= start + 1e-3:
+        # Already on a keyframe
+        return stream_copy(video_path, after[0], end, output_path), after[0]
+    
+    if info['codec'] != 'h264' or info['audio_codec'] not in (None, 'aac'):
+        return keyframe_cut(video_path, start, end, output_path, search_window)
+    
+    head_end = after[0] if after and after[0] < end else end
+    fps_args = ['-r', f"{info['fps']:g}"] if info['fps'] else []
+    pix_fmt_args = ['-pix_fmt', info['pix_fmt']] if info['pix_fmt'] else []
+    thread_args = ['-threads', str(threads)] if threads else []
+    
+    work_dir = tempfile.mkdtemp(prefix="pulsepoint_cut_")
+    head_path = os.path.join(work_dir, "head.mp4")
+    tail_path = os.path.join(work_dir, "tail.mp4")
+    list_path = os.path.join(work_dir, "parts.txt")
+    
+    try:
+        # Input seek jumps to the previous keyframe, then decodes up to start exactly
+        _run_ffmpeg([
+            '-y',
+            '-ss', f"{start:.6f}",
+            '-i', video_path,
+            '-t', f"{head_end - start:.6f}",
+            '-map', '0:v:0',
+            '-map', '0:a?',
+            '-c:v', 'libx264',
+            '-preset', 'veryfast',
+            '-crf', '18'
+        ] + fps_args + pix_fmt_args + thread_args + [
+            '-c:a', 'aac',
+            head_path
+        ])
+        
+        if head_end >= end:
+            os.replace(head_path, output_path)
+            return str(output_path), start
+        
+        stream_copy(video_path, head_end, end, tail_path)
+        
+        with open(list_path, 'w') as f:
+            f.write(f"file '{head_path}'\nfile '{tail_path}'\n")
+        
+        _run_ffmpeg([
+            '-y',
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', list_path,
+            '-c', 'copy',
+            '-movflags', '+faststart',
+            str(output_path)
+        ])
+        
+        # A timestamp jump at the seam would show as a stutter; copy from a keyframe instead
+        if info['fps'] and _has_frame_gap(output_path, head_end - start, info['fps']):
+            print(f"Smart cut left a gap at the seam in {video_path}, cutting at a keyframe instead")
+            return keyframe_cut(video_path, start, end, output_path, search_window)
+        
+        return str(output_path), start
+    
+    finally:
+        for path in (head_path, tail_path, list_path):
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(work_dir)
+
+
+def probe_video_size(video_path):
+    """
+    Read the frame size of the first video stream
+    
+    Args:
+        video_path: Path to source video
+        
+    Returns:
+        Tuple of (width, height)
+    """
+    stderr = _run_ffmpeg(['-i', video_path, '-map', '0:v:0', '-t', '0', '-f', 'null', '-'])
+    
+    size = re.search(r'Stream #0:\d+.*?: Video: .*?, (\d{2,5})x(\d{2,5})', stderr)
+    if not size:
+        raise RuntimeError(f"No video stream found in {video_path}")
+    return int(size.group(1)), int(size.group(2))
+
+
+def _filter_path(path):
+    """Quote a file path for use as a filter option value"""
+    return "'" + str(path).replace('\\', '/').replace(':', '\\:') + "'"
+
+
+def _write_caption_file(path, text, width, height, duration):
+    """
+    Write an ASS subtitle file showing one caption for the whole clip
+    
+    Styled like the MoviePy overlay: 40px bold white text with a black
+    outline, centered at the bottom and wrapped to 90% of the frame width.
+    
+    Args:
+        path: Path for the .ass file
+        text: Caption text
+        width: Frame width the caption is laid out for
+        height: Frame height the caption is laid out for
+        duration: Clip duration in seconds
+    """
+    # Braces start override blocks and backslashes escapes in ASS
+    text = ' '.join(text.replace('{', '(').replace('}', ')').replace('\\', '/').split())
+    margin = int(width * 0.05)
+    hours, rem = divmod(duration, 3600)
+    minutes, seconds = divmod(rem, 60)
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(
+            "[Script Info]\n"
+            "ScriptType: v4.00+\n"
+            f"PlayResX: {width}\n"
+            f"PlayResY: {height}\n"
+            "WrapStyle: 0\n"
+            "ScaledBorderAndShadow: yes\n"
+            "\n"
+            "[V4+ Styles]\n"
+            "Format: Name, Fontname, Fontsize, PrimaryColour, OutlineColour, BackColour, Bold, "
+            "BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV\n"
+            f"Style: Caption, Arial, 40, &H00FFFFFF, &H00000000, &H00000000, -1, 1, 2, 0, 2, "
+            f"{margin}, {margin}, 0\n"
+            "\n"
+            "[Events]\n"
+            "Format: Layer, Start, End, Style, Text\n"
+            f"Dialogue: 0, 0:00:00.00, {int(hours)}:{int(minutes):02d}:{seconds:05.2f}, Caption, {text}\n"
+        )
+
+
+def _write_crop_commands(path, times, xs):
+    """
+    Write sendcmd commands moving the crop's x offset over time
+    
+    Args:
+        path: Path for the command file
+        times: Command times in seconds from the clip start
+        xs: Crop left edge at each time
+    """
+    with open(path, 'w') as f:
+        previous = None
+        for t, x in zip(times, xs):
+            # Only emit changes; the crop keeps its offset between commands
+            if x != previous:
+                f.write(f"{t:.4f} crop x {x};\n")
+                previous = x
+
+
+def render_clip(video_path, start, end, output_path, vertical=False, caption=None, fps=24, threads=None,
+                profile=None, crop_track=None, frame_size=None):
+    """
+    Render a clip with crop and caption applied in a single ffmpeg filter graph
+    
+    Frames stay inside ffmpeg: decode, crop, subtitle overlay and encode run
+    in one subprocess instead of passing every frame through Python.
+    
+    Args:
+        video_path: Path to source video
+        start: Start time in seconds
+        end: End time in seconds
+        output_path: Path for output video file
+        vertical: Crop to 9:16, centered unless crop_track is given
+        caption: Optional caption text burned in at the bottom
+        fps: Output frame rate
+        threads: Encoder threads, the profile's when None
+        profile: Render profile settings, see render_profiles (default 'standard')
+        crop_track: Optional smart_crop.track_crop path the vertical crop follows
+        frame_size: Source (width, height) when already known, probed otherwise
+        
+    Returns:
+        Path to the clip
+    """
+    profile = profile or render_profiles.get_render_profile()
+    width, height = frame_size or probe_video_size(video_path)
+    filters = []
+    
+    work_dir = tempfile.mkdtemp(prefix="pulsepoint_render_")
+    caption_path = os.path.join(work_dir, "caption.ass")
+    commands_path = os.path.join(work_dir, "crop.cmd")
+    
+    try:
+        if vertical:
+            target_width = int(height * 9 / 16)
+            if target_width < width:
+                # Kept even for yuv420p
+                target_width -= target_width % 2
+                
+                if crop_track is None:
+                    x = (width - target_width) // 2
+                else:
+                    # Move the crop once per output frame from a command file
+                    times = np.arange(int(np.ceil((end - start) * fps))) / fps
+                    xs = smart_crop.crop_left_edges(crop_track, times, width, target_width)
+                    _write_crop_commands(commands_path, times, xs)
+                    filters.append(f"sendcmd=filename={_filter_path(commands_path)}")
+                    x = xs[0] if len(xs) else (width - target_width) // 2
+                
+                filters.append(f"crop={target_width}:{height}:{x}:0")
+                width = target_width
+        
+        # Scale before the caption so it is laid out at output resolution
+        width, height = render_profiles.fit_size(width, height, profile)
+        filters.append(f"scale={width}:{height}")
+        
+        if caption:
+            _write_caption_file(caption_path, caption, width, height, end - start)
+            filters.append(f"subtitles=filename={_filter_path(caption_path)}")
+        
+        filters.append(f"fps={fps}")
+        filters.append("format=yuv420p")
+        
+        _run_ffmpeg([
+            '-y',
+            '-ss', f"{start:.6f}",
+            '-i', video_path,
+            '-t', f"{end - start:.6f}",
+            '-map', '0:v:0',
+            '-map', '0:a?',
+            '-vf', ','.join(filters)
+        ] + render_profiles.ffmpeg_encoder_args(profile, threads) + [
+            '-movflags', '+faststart',
+            str(output_path)
+        ])
+        return str(output_path)
+    
+    finally:
+        for path in (caption_path, commands_path):
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(work_dir)
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from utils import cleanup_temp_files
+
+# Parent of every job directory
+JOBS_ROOT = Path(tempfile.gettempdir()) / "pulsepoint_jobs"
+
+# Live references per job id in this process; the last release() deletes the job
+_refcounts = {}
+_refcounts_lock = threading.Lock()
+
+
+class JobWorkspace:
+    """Private work directory for one processing job"""
+    
+    def __init__(self, job_id=None, root=None):
+        """
+        Create (or reopen) a job directory
+        
+        Args:
+            job_id: Existing job id to reopen, a new one is generated when None
+            root: Parent directory, JOBS_ROOT by default
+        """
+        self.job_id = job_id or uuid.uuid4().hex
+        self.root = Path(root or JOBS_ROOT)
+        self.directory = self.root / self.job_id
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    def path(self, name):
+        """
+        Path inside the job directory; parent directories are created
+        
+        Args:
+            name: Relative file or directory name
+            
+        Returns:
+            Path
+        """
+        path = self.directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+    
+    def touch(self):
+        """Mark the job as recently used so TTL cleanup keeps it"""
+        try:
+            os.utime(self.directory)
+        except FileNotFoundError:
+            pass
+    
+    def acquire(self):
+        """
+        Take a reference to the job
+        
+        Returns:
+            self
+        """
+        with _refcounts_lock:
+            _refcounts[self.job_id] = _refcounts.get(self.job_id, 0) + 1
+        self.touch()
+        return self
+    
+    def release(self):
+        """Drop a reference; the directory is deleted with the last one"""
+        with _refcounts_lock:
+            count = _refcounts.get(self.job_id, 0) - 1
+            if count > 0:
+                _refcounts[self.job_id] = count
+                return
+            _refcounts.pop(self.job_id, None)
+        
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def cleanup_expired_jobs(ttl_seconds=6 * 3600, root=None):
+    """
+    Delete job directories untouched for longer than the TTL
+    
+    Referenced jobs expire too, counted from their last touch(): a Streamlit
+    session that ends never calls release(), so its reference would keep the
+    job forever.
+    
+    Args:
+        ttl_seconds: Age after which a job is removed
+        root: Parent directory, JOBS_ROOT by default
+    """
+    root = Path(root or JOBS_ROOT)
+    cleanup_temp_files(str(root), max_age_seconds=ttl_seconds)
+    
+    # Forget references to the jobs just removed
+    with _refcounts_lock:
+        for job_id in [job_id for job_id in _refcounts if not (root / job_id).exists()]:
+            del _refcounts[job_id]
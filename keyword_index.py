@@ -0,0 +1,76 @@
+from collections import deque
+
+
+class KeywordIndex:
+    """Aho-Corasick matcher that finds every keyword in a single pass over text"""
+    
+    def __init__(self, keywords):
+        """
+        Build the automaton once for a keyword list
+        
+        Args:
+            keywords: List of keywords (matched case-insensitively, empty ones ignored)
+        """
+        self.keywords = list(keywords)
+        
+        # State 0 is the root; each state has goto edges, a fail link and outputs
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        
+        for i, kw in enumerate(self.keywords):
+            pattern = kw.lower()
+            if not pattern:
+                continue
+            
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((i, len(pattern)))
+        
+        self._build_fail_links()
+    
+    def _build_fail_links(self):
+        """Breadth-first pass setting fail links and merging suffix outputs"""
+        queue = deque(self._goto[0].values())
+        
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+    
+    def search(self, text):
+        """
+        Find all keyword occurrences in text
+        
+        Args:
+            text: Text to scan (offsets refer to text.lower())
+            
+        Returns:
+            List of (keyword_index, start_char, end_char) tuples, end exclusive
+        """
+        matches = []
+        state = 0
+        
+        for pos, ch in enumerate(text.lower()):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            
+            for kw_idx, length in self._out[state]:
+                matches.append((kw_idx, pos + 1 - length, pos + 1))
+        
+        return matches
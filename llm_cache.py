@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from utils import atomic_output
+
+
+class LLMResponseCache:
+    """Persistent JSON cache of parsed LLM results with a TTL and LRU size bound"""
+    
+    def __init__(self, cache_dir=None, ttl_seconds=7 * 24 * 3600, max_entries=500):
+        """
+        Initialize the response cache
+        
+        Args:
+            cache_dir: Directory holding entries, a temp subdirectory by default
+            ttl_seconds: Age after which an entry is ignored and deleted
+            max_entries: Entries kept before least recently used ones are evicted
+        """
+        self.cache_dir = Path(cache_dir or Path(tempfile.gettempdir()) / "pulsepoint_llm_cache")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(**inputs):
+        """
+        Cache key for a set of prompt inputs
+        
+        Args:
+            **inputs: JSON-serializable values that determine the response,
+                including the model name
+                
+        Returns:
+            Hex digest
+        """
+        payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def _path(self, key):
+        """Location of an entry"""
+        return self.cache_dir / f"{key}.json"
+    
+    def get(self, key):
+        """
+        Look up a cached value
+        
+        Args:
+            key: Key from key()
+            
+        Returns:
+            The stored value, or None on a miss or an expired entry
+        """
+        path = self._path(key)
+        
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        
+        if time.time() - entry.get('created', 0) > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            return None
+        
+        # Mark as recently used
+        os.utime(path)
+        return entry.get('value')
+    
+    def set(self, key, value):
+        """
+        Store a value and evict entries over the bound
+        
+        Args:
+            key: Key from key()
+            value: JSON-serializable value
+        """
+        # Write then rename so readers never see a partial entry
+        with atomic_output(self._path(key), suffix='.part') as partial_path:
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                json.dump({'created': time.time(), 'value': value}, f)
+        
+        self._evict()
+    
+    def _evict(self):
+        """Delete least recently used entries beyond max_entries"""
+        with self._lock:
+            entries = []
+            for path in self.cache_dir.glob("*.json"):
+                try:
+                    entries.append((path.stat().st_mtime, path))
+                except FileNotFoundError:
+                    continue
+            
+            for _, path in sorted(entries)[:max(0, len(entries) - self.max_entries)]:
+                path.unlink(missing_ok=True)
+    
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            for path in self.cache_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+
+# Shared by every ClipGenerator in the process
+llm_cache = LLMResponseCache()
@@ -0,0 +1,368 @@
+"""
+Asynchronous LLM calls with shared rate limiting, timeouts, retries and a circuit breaker
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# HTTP statuses worth retrying: timeouts, quota and transient server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# google.api_core exception class names with the same meaning
+RETRYABLE_ERRORS = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'DeadlineExceeded',
+    'InternalServerError', 'GatewayTimeout', 'Aborted'
+}
+
+
+class LLMError(Exception):
+    """Failed LLM request"""
+    
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(LLMError):
+    """Raised without calling the API while the circuit breaker is open"""
+
+
+def is_retryable(error):
+    """
+    Whether a failed request may succeed if sent again
+    
+    Args:
+        error: Exception raised by a backend
+        
+    Returns:
+        Boolean
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    
+    status = getattr(error, 'status', None) or getattr(error, 'code', None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+class TokenBucket:
+    """Thread-safe token bucket; one instance paces every job in the process"""
+    
+    def __init__(self, rate, burst=1):
+        """
+        Initialize the bucket full
+        
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity, the requests allowed back to back
+        """
+        self.rate = rate
+        self.burst = burst
+        
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now):
+        """Add the tokens earned since the last update"""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def reserve(self, tokens=1):
+        """
+        Take tokens now, possibly going into debt
+        
+        Callers queue behind each other in reservation order, across threads
+        and event loops, because each reservation is paid for up front.
+        
+        Args:
+            tokens: Tokens to take
+            
+        Returns:
+            Seconds to wait before the tokens are actually available
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+    
+    def try_take(self, tokens=1):
+        """
+        Take tokens only if they are available now
+        
+        Args:
+            tokens: Tokens to take
+            
+        Returns:
+            True if the tokens were taken
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+    
+    async def acquire(self, tokens=1):
+        """
+        Wait until tokens are available
+        
+        Args:
+            tokens: Tokens to take
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """Stops calling a failing API for a while so jobs fall back quickly"""
+    
+    def __init__(self, failure_threshold=5, reset_seconds=30.0):
+        """
+        Initialize the breaker closed
+        
+        Args:
+            failure_threshold: Consecutive retryable failures that open the circuit
+            reset_seconds: Time the circuit stays open before one trial request
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self):
+        """'closed', 'open' or 'half_open'"""
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return 'open'
+            return 'half_open'
+    
+    def allow(self):
+        """
+        Whether a request may be sent now
+        
+        Returns:
+            True while closed, and for a single trial request once the reset
+            time has passed
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+    
+    def record_success(self):
+        """Close the circuit"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+    
+    def release_trial(self):
+        """Let another request be the trial when this one was abandoned without an answer"""
+        with self._lock:
+            self._trial_running = False
+    
+    def record_failure(self):
+        """Count a failure; opens the circuit at the threshold or after a failed trial"""
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class GeminiBackend:
+    """Runs the blocking google-generativeai call in a worker thread"""
+    
+    def __init__(self, model, timeout=60.0):
+        """
+        Args:
+            model: genai.GenerativeModel
+            timeout: Deadline passed to the API so abandoned calls don't linger
+        """
+        self.model = model
+        self.timeout = timeout
+    
+    async def __call__(self, prompt):
+        response = await asyncio.to_thread(
+            self.model.generate_content, prompt, request_options={'timeout': self.timeout}
+        )
+        return response.text
+
+
+class HTTPBackend:
+    """POSTs {"prompt": ...} and reads {"text": ...}, e.g. llm_stub_server"""
+    
+    def __init__(self, url, timeout=60.0):
+        """
+        Args:
+            url: Endpoint URL
+            timeout: Socket timeout in seconds
+        """
+        self.url = url
+        self.timeout = timeout
+    
+    def _post(self, prompt):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({'prompt': prompt}).encode(),
+            headers={'Content-Type': 'application/json'}
+        )
+        
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())['text']
+        except urllib.error.HTTPError as e:
+            retry_after = e.headers.get('Retry-After')
+            raise LLMError(
+                f"HTTP {e.code} from {self.url}",
+                status=e.code,
+                retry_after=float(retry_after) if retry_after else None
+            )
+        except urllib.error.URLError as e:
+            raise ConnectionError(f"Could not reach {self.url}: {str(e.reason)}")
+    
+    async def __call__(self, prompt):
+        return await asyncio.to_thread(self._post, prompt)
+
+
+class AsyncLLMClient:
+    """Sends prompts through a rate limiter and circuit breaker, with timeouts and jittered retries"""
+    
+    def __init__(self, backend, limiter=None, breaker=None, timeout=60.0, max_retries=3, base_delay=1.0,
+                 max_delay=30.0):
+        """
+        Initialize the client
+        
+        Args:
+            backend: Async callable taking a prompt and returning the response text
+            limiter: TokenBucket, the process-wide rate_limiter by default
+            breaker: CircuitBreaker, the process-wide circuit_breaker by default
+            timeout: Seconds allowed per attempt
+            max_retries: Retries after the first attempt
+            base_delay: Backoff before the first retry; doubles on each retry
+            max_delay: Backoff cap
+        """
+        self.backend = backend
+        self.limiter = limiter or rate_limiter
+        self.breaker = breaker or circuit_breaker
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    async def generate(self, prompt):
+        """
+        Get the model's response text for a prompt
+        
+        Args:
+            prompt: Prompt text
+            
+        Returns:
+            Response text
+        """
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("LLM circuit breaker is open after repeated failures")
+            
+            try:
+                await self.limiter.acquire()
+                text = await asyncio.wait_for(self.backend(prompt), self.timeout)
+            except asyncio.CancelledError:
+                # The caller gave up; don't leave a half-open circuit waiting on this trial forever
+                self.breaker.release_trial()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # The service answered; the request itself is bad
+                    self.breaker.record_success()
+                    raise
+                
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                
+                # Full jitter keeps concurrent jobs from retrying in lockstep
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                retry_after = getattr(e, 'retry_after', None)
+                if retry_after:
+                    delay = max(delay, retry_after)
+                
+                print(f"LLM request failed ({type(e).__name__}: {str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            
+            self.breaker.record_success()
+            return text
+    
+    async def generate_many(self, prompts, concurrency=8):
+        """
+        Send prompts concurrently
+        
+        Args:
+            prompts: Prompt texts
+            concurrency: Requests in flight at once from this call
+            
+        Returns:
+            Response text or the raised exception for each prompt, in order
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def bounded(prompt):
+            async with semaphore:
+                return await self.generate(prompt)
+        
+        return await asyncio.gather(*(bounded(prompt) for prompt in prompts), return_exceptions=True)
+    
+    def generate_sync(self, prompt):
+        """Blocking generate()"""
+        return run_sync(self.generate(prompt))
+    
+    def generate_many_sync(self, prompts, concurrency=8):
+        """Blocking generate_many()"""
+        return run_sync(self.generate_many(prompts, concurrency))
+
+
+def run_sync(coroutine):
+    """
+    Run a coroutine to completion from synchronous code
+    
+    Args:
+        coroutine: Coroutine to run
+        
+    Returns:
+        Its result
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    
+    # Called from inside an event loop: run on a fresh loop in another thread
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+# Shared by every job in the process so they stay inside one API quota
+rate_limiter = TokenBucket(rate=1.0, burst=10)
+circuit_breaker = CircuitBreaker()
@@ -0,0 +1,166 @@
+"""
+Local stand-in for the LLM API with simulated latency, errors and quota
+
+Answers moment prompts with plausible JSON built from the timestamps and
+peaks in the prompt, so the app runs end to end offline. Point it at the
+app with LLM_ENDPOINT=http://127.0.0.1:8765/generate.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from llm_client import TokenBucket
+
+
+def stub_moments(prompt):
+    """
+    Build a moment list for a prompt from the times it mentions
+    
+    Args:
+        prompt: Moment prompt from ClipGenerator or moment_discovery
+        
+    Returns:
+        List of moment dictionaries
+    """
+    count_match = re.search(r'(?:Find up to|Identify the) (\d+)', prompt)
+    duration_match = re.search(r'engaging (\d+(?:\.\d+)?)-second', prompt)
+    count = int(count_match.group(1)) if count_match else 3
+    duration = float(duration_match.group(1)) if duration_match else 60.0
+    
+    # Prefer emotional peaks ("<second>:<score>"), then transcript line starts ("[<second>]")
+    peaks_line = re.search(r'EMOTIONAL PEAKS.*:\n(.*)', prompt)
+    times = [float(t) for t in re.findall(r'(\d+):[\d.]+', peaks_line.group(1))] if peaks_line else []
+    times += [float(t) for t in re.findall(r'^\[(\d+)\]', prompt, re.MULTILINE)]
+    
+    moments = []
+    for t in times:
+        if len(moments) == count:
+            break
+        start = max(0.0, t - 5.0)
+        if all(abs(start - m['start_time']) >= duration for m in moments):
+            moments.append({
+                'start_time': start,
+                'end_time': start + duration,
+                'title': f"Moment at {start:.0f} seconds",
+                'hook': "You won't believe what happens next",
+                'reason': "Stub response",
+                'estimated_virality': random.randint(4, 9)
+            })
+    
+    return moments
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Handles POST {"prompt": ...} with {"text": ...}"""
+    
+    def do_POST(self):
+        options = self.server.options
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            prompt = json.loads(self.rfile.read(length))['prompt']
+        except (ValueError, KeyError):
+            self._reply(400, {'error': 'expected {"prompt": ...}'})
+            return
+        
+        if options['quota'] and not options['quota'].try_take():
+            self._reply(429, {'error': 'quota exceeded'}, {'Retry-After': '1'})
+            return
+        
+        time.sleep(max(0.0, random.gauss(options['latency'], options['jitter'])))
+        
+        roll = random.random()
+        if roll < options['hang_rate']:
+            # Never answer in time so clients exercise their timeouts
+            time.sleep(options['hang_seconds'])
+            self._reply(504, {'error': 'hung'})
+        elif roll < options['hang_rate'] + options['error_rate']:
+            self._reply(random.choice((429, 500, 503)), {'error': 'simulated failure'})
+        else:
+            self._reply(200, {'text': json.dumps(stub_moments(prompt), indent=2)})
+    
+    def _reply(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out and went away
+            pass
+    
+    def log_message(self, format, *args):
+        if self.server.options['verbose']:
+            super().log_message(format, *args)
+
+
+def start_stub_server(host='127.0.0.1', port=0, latency=0.5, jitter=0.1, error_rate=0.0, hang_rate=0.0,
+                      hang_seconds=120.0, requests_per_minute=None, verbose=False):
+    """
+    Start the stub server on a background thread
+    
+    Args:
+        host: Interface to bind
+        port: Port to bind, 0 picks a free one
+        latency: Mean response time in seconds
+        jitter: Standard deviation of the response time
+        error_rate: Share of requests answered with 429/500/503
+        hang_rate: Share of requests that stall for hang_seconds
+        hang_seconds: How long a stalled request takes
+        requests_per_minute: Simulated quota; excess requests get 429
+        verbose: Log every request
+        
+    Returns:
+        Tuple of (server, endpoint URL); call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.options = {
+        'latency': latency,
+        'jitter': jitter,
+        'error_rate': error_rate,
+        'hang_rate': hang_rate,
+        'hang_seconds': hang_seconds,
+        'quota': TokenBucket(requests_per_minute / 60.0, burst=max(1, requests_per_minute // 60))
+        if requests_per_minute else None,
+        'verbose': verbose
+    }
+    
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{server.server_address[0]}:{server.server_address[1]}/generate"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local LLM stand-in for offline and load testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help="mean response time (s)")
+    parser.add_argument('--jitter', type=float, default=0.1, help="response time std dev (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of 429/500/503 replies")
+    parser.add_argument('--hang-rate', type=float, default=0.0, help="share of requests that stall")
+    parser.add_argument('--hang-seconds', type=float, default=120.0)
+    parser.add_argument('--rpm', type=int, default=None, help="simulated requests-per-minute quota")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    
+    server, url = start_stub_server(
+        args.host, args.port, args.latency, args.jitter, args.error_rate, args.hang_rate, args.hang_seconds,
+        args.rpm, args.verbose
+    )
+    print(f"LLM stub listening on {url}")
+    
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import threading
+from collections import OrderedDict
+import whisper
+
+# psutil is optional; without it eviction only follows the model count bound
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    PSUTIL_AVAILABLE = False
+
+
+class WhisperModelPool:
+    """Process-wide LRU cache of loaded Whisper models keyed by size and device"""
+    
+    def __init__(self, max_models=2, min_free_memory_mb=1024, loader=None):
+        """
+        Initialize the model pool
+        
+        Args:
+            max_models: Maximum number of models kept loaded at once
+            min_free_memory_mb: Evict least recently used models before a load
+                while available memory is below this
+            loader: Callable (model_size, device) -> model, defaults to
+                whisper.load_model
+        """
+        self.max_models = max_models
+        self.min_free_memory_mb = min_free_memory_mb
+        self.loader = loader or (lambda model_size, device: whisper.load_model(model_size, device=device))
+        
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+    
+    @staticmethod
+    def resolve_device(device):
+        """Pick the device whisper.load_model would use by default"""
+        if device:
+            return device
+        
+        try:
+            import torch
+            return 'cuda' if torch.cuda.is_available() else 'cpu'
+        except ImportError:
+            return 'cpu'
+    
+    def get(self, model_size='base', device=None):
+        """
+        Get a loaded model, loading it on first use
+        
+        Args:
+            model_size: Whisper model size ('tiny', 'base', 'small', 'medium', 'large')
+            device: Torch device, defaults to CUDA when available
+            
+        Returns:
+            Loaded Whisper model
+        """
+        key = (model_size, self.resolve_device(device))
+        
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        
+        # Per-key lock: concurrent jobs wait for one load instead of each loading
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key]
+            
+            self._make_room()
+            
+            print(f"Loading Whisper model ({model_size}) on {key[1]}...")
+            model = self.loader(model_size, key[1])
+            
+            with self._lock:
+                self._models[key] = model
+                self._load_locks.pop(key, None)
+                self._evict_over_capacity()
+            
+            return model
+    
+    def warm_up(self, model_sizes=('base',), device=None, background=True):
+        """
+        Load models ahead of the first job
+        
+        Args:
+            model_sizes: Model sizes to load
+            device: Torch device, defaults to CUDA when available
+            background: Load in a daemon thread instead of blocking
+            
+        Returns:
+            The loader thread when background is set, otherwise None
+        """
+        def _load():
+            for model_size in model_sizes:
+                try:
+                    self.get(model_size, device)
+                except Exception as e:
+                    print(f"Whisper warm-up failed for {model_size}: {str(e)}")
+        
+        if not background:
+            _load()
+            return None
+        
+        thread = threading.Thread(target=_load, name="whisper-warm-up", daemon=True)
+        thread.start()
+        return thread
+    
+    def _available_memory_mb(self):
+        """Available system memory in MB, or None when it can't be measured"""
+        if not PSUTIL_AVAILABLE:
+            return None
+        return psutil.virtual_memory().available / (1024 * 1024)
+    
+    def _make_room(self):
+        """Evict least recently used models while memory is tight"""
+        while True:
+            available = self._available_memory_mb()
+            if available is None or available >= self.min_free_memory_mb:
+                return
+            
+            with self._lock:
+                if not self._models:
+                    return
+                key, _ = self._models.popitem(last=False)
+            
+            print(f"Evicting Whisper model {key[0]} ({key[1]}) to free memory")
+            self._release(key[1])
+    
+    def _evict_over_capacity(self):
+        """Drop least recently used models beyond max_models (caller holds the lock)"""
+        while len(self._models) > self.max_models:
+            key, _ = self._models.popitem(last=False)
+            print(f"Evicting Whisper model {key[0]} ({key[1]})")
+            self._release(key[1])
+    
+    @staticmethod
+    def _release(device):
+        """Return freed GPU memory to the driver"""
+        if str(device).startswith('cuda'):
+            try:
+                import torch
+                torch.cuda.empty_cache()
+            except Exception:
+                pass
+    
+    def clear(self):
+        """Unload every model"""
+        with self._lock:
+            devices = {key[1] for key in self._models}
+            self._models.clear()
+        
+        for device in devices:
+            self._release(device)
+
+
+# Shared by every EmotionDetector in the process
+whisper_model_pool = WhisperModelPool()
@@ -0,0 +1,322 @@
+"""
+Moment discovery prompts: compact transcript packing and map-reduce over long transcripts
+"""
+import json
+import re
+import numpy as np
+
+# Rough characters-per-token ratio for English text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """
+    Approximate the token count of text
+    
+    Args:
+        text: Prompt text
+        
+    Returns:
+        Estimated tokens
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def compact_line(segment):
+    """
+    One transcript segment as a prompt line, "[<start second>] text"
+    
+    Args:
+        segment: Whisper-style segment
+        
+    Returns:
+        Line text, or '' for a silent segment
+    """
+    text = ' '.join(segment['text'].split())
+    return f"[{int(segment['start'])}] {text}" if text else ''
+
+
+def transcript_tokens(segments):
+    """
+    Estimated tokens of the whole transcript as compact lines
+    
+    Args:
+        segments: Whisper-style segments
+        
+    Returns:
+        Estimated tokens
+    """
+    return sum(estimate_tokens(line) for line in map(compact_line, segments) if line)
+
+
+def compact_peaks(emotional_peaks, limit=20):
+    """
+    Strongest peaks as "<second>:<score>" pairs on one line
+    
+    Args:
+        emotional_peaks: List of emotional peaks
+        limit: Peaks listed
+        
+    Returns:
+        Peak summary text
+    """
+    strongest = sorted(emotional_peaks, key=lambda p: p['score'], reverse=True)[:limit]
+    return ' '.join(f"{int(peak['time'])}:{peak['score']:.2f}" for peak in strongest) or "none"
+
+
+def segment_priorities(segments, emotional_peaks, peak_window=30.0, max_peaks=50):
+    """
+    How close each segment is to a strong emotional peak
+    
+    Args:
+        segments: Whisper-style segments
+        emotional_peaks: List of emotional peaks
+        peak_window: Distance in seconds at which a peak's pull falls to 1/e
+        max_peaks: Strongest peaks considered
+        
+    Returns:
+        Array with one priority per segment, higher means include first
+    """
+    if not segments or not emotional_peaks:
+        return np.zeros(len(segments))
+    
+    strongest = sorted(emotional_peaks, key=lambda p: p['score'], reverse=True)[:max_peaks]
+    peak_times = np.array([p['time'] for p in strongest], dtype=np.float64)
+    peak_scores = np.array([p['score'] for p in strongest], dtype=np.float64)
+    starts = np.array([s['start'] for s in segments], dtype=np.float64)[:, None]
+    ends = np.array([s['end'] for s in segments], dtype=np.float64)[:, None]
+    
+    # Distance from each peak to each segment's time range, zero inside it
+    distance = np.maximum(0.0, np.maximum(starts - peak_times, peak_times - ends))
+    return (peak_scores * np.exp(-(distance / peak_window) ** 2)).max(axis=1)
+
+
+def pack_transcript(segments, emotional_peaks, max_tokens=2000, peak_window=30.0):
+    """
+    Fit the most useful transcript lines into a token budget
+    
+    Lines are taken in order of closeness to strong emotional peaks until
+    the budget is spent, then written back in time order. Skipped stretches
+    become a "..." line.
+    
+    Args:
+        segments: Whisper-style segments
+        emotional_peaks: List of emotional peaks
+        max_tokens: Transcript token budget
+        peak_window: Distance in seconds at which a peak's pull falls to 1/e
+        
+    Returns:
+        Tuple of (packed text, True if every segment fitted)
+    """
+    lines = [compact_line(segment) for segment in segments]
+    costs = np.array([estimate_tokens(line) if line else 0 for line in lines])
+    
+    if costs.sum() <= max_tokens:
+        return '\n'.join(line for line in lines if line), True
+    
+    # Stable sort keeps earlier lines first among equal priorities
+    order = np.argsort(-segment_priorities(segments, emotional_peaks, peak_window), kind='stable')
+    
+    keep = np.zeros(len(lines), dtype=bool)
+    budget = max_tokens
+    for idx in order:
+        if lines[idx] and costs[idx] + 1 <= budget:
+            keep[idx] = True
+            budget -= costs[idx] + 1  # room for a possible "..." marker
+    
+    packed = []
+    previous = -1
+    for idx in np.flatnonzero(keep):
+        if idx > previous + 1 and any(lines[previous + 1:idx]):
+            packed.append('...')
+        packed.append(lines[idx])
+        previous = idx
+    if any(lines[previous + 1:]):
+        packed.append('...')
+    
+    return '\n'.join(packed), False
+
+
+def snap_to_segments(moments, segments, max_shift=30.0):
+    """
+    Move each moment's start onto the nearest segment start
+    
+    Keeps clips on sentence boundaries and corrects timestamps the model
+    rounded; the clip keeps its length. Moments with no segment start within
+    max_shift were made up and are dropped, as are duplicates after snapping.
+    
+    Args:
+        moments: Moment dictionaries from the model
+        segments: Whisper-style segments
+        max_shift: Largest correction in seconds
+        
+    Returns:
+        List of grounded moments
+    """
+    starts = np.array(sorted(s['start'] for s in segments if s['text'].strip()), dtype=np.float64)
+    if not len(starts):
+        return moments
+    
+    grounded = []
+    seen = set()
+    for moment in moments:
+        try:
+            start = float(moment['start_time'])
+            end = float(moment['end_time'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        
+        idx = int(np.searchsorted(starts, start))
+        neighbours = starts[max(0, idx - 1):idx + 1]
+        snapped = float(neighbours[np.argmin(np.abs(neighbours - start))])
+        if abs(snapped - start) > max_shift or snapped in seen:
+            continue
+        
+        seen.add(snapped)
+        grounded.append(dict(moment, start_time=snapped, end_time=end + snapped - start))
+    
+    return grounded
+
+
+def build_windows(segments, max_tokens=2000):
+    """
+    Group consecutive transcript segments into token-budgeted windows
+    
+    Args:
+        segments: Whisper-style segments with 'start', 'end' and 'text'
+        max_tokens: Transcript token budget per window
+        
+    Returns:
+        List of windows with 'start', 'end' and compact timestamped 'text'
+    """
+    windows = []
+    lines = []
+    tokens = 0
+    window_start = None
+    previous_end = None
+    
+    for segment in segments:
+        line = compact_line(segment)
+        if not line:
+            continue
+        
+        line_tokens = estimate_tokens(line)
+        
+        if lines and tokens + line_tokens > max_tokens:
+            windows.append({'start': window_start, 'end': previous_end, 'text': '\n'.join(lines)})
+            lines, tokens = [], 0
+        
+        if not lines:
+            window_start = segment['start']
+        lines.append(line)
+        tokens += line_tokens
+        previous_end = segment['end']
+    
+    if lines:
+        windows.append({'start': window_start, 'end': previous_end, 'text': '\n'.join(lines)})
+    
+    return windows
+
+
+def window_prompt(window, emotional_peaks, num_candidates, clip_duration):
+    """
+    Prompt asking for candidate moments inside one window
+    
+    Args:
+        window: Window from build_windows
+        emotional_peaks: List of emotional peaks for the whole video
+        num_candidates: Moments to ask for
+        clip_duration: Target clip duration
+        
+    Returns:
+        Prompt text
+    """
+    peaks = [p for p in emotional_peaks if window['start'] <= p['time'] <= window['end']]
+    
+    return f"""You are an expert video editor scanning one section of a long-form video for viral-worthy, high-impact short clips.
+
+TRANSCRIPT SECTION ({window['start']:.1f}s to {window['end']:.1f}s). Each line is [start second] text and lasts until the next line:
+{window['text']}
+
+EMOTIONAL PEAKS IN THIS SECTION (second:score):
+{compact_peaks(peaks, limit=10)}
+
+TASK:
+Find up to {num_candidates} moments in this section that would make engaging {clip_duration}-second social media clips.
+Each moment must start inside this section, at the start second of a transcript line. Return fewer if the section has nothing strong.
+
+CRITERIA:
+- Strong emotional impact, surprising insights, or actionable advice
+- Self-contained, with a hook in the first 3 seconds
+- Prefer moments near the emotional peaks
+
+OUTPUT FORMAT:
+[
+  {{
+    "start_time": <seconds>,
+    "end_time": <seconds>,
+    "title": "<catchy 5-8 word title>",
+    "hook": "<attention-grabbing first line>",
+    "reason": "<why this moment is valuable>",
+    "estimated_virality": <score 1-10>
+  }}
+]
+
+Return ONLY the JSON array, no other text.
+"""
+
+
+def parse_moments(response_text):
+    """
+    Extract the JSON array of moments from a model response
+    
+    Args:
+        response_text: Raw model output
+        
+    Returns:
+        List of moment dictionaries, or None when no array was found
+    """
+    json_match = re.search(r'\[\s*\{.*\}\s*\]', response_text, re.DOTALL)
+    if not json_match:
+        return None
+    return json.loads(json_match.group())
+
+
+def rank_candidates(candidates, emotional_peaks, num_clips, clip_duration, peak_weight=0.3):
+    """
+    Reduce step: score candidates and pick the best non-overlapping set
+    
+    Each candidate's score blends the model's virality estimate with the
+    strongest emotional peak inside its clip range.
+    
+    Args:
+        candidates: Moment dictionaries from every window
+        emotional_peaks: List of emotional peaks
+        num_clips: Number of moments to return
+        clip_duration: Clip duration used for overlap checks
+        peak_weight: Share of the score taken from audio peaks
+        
+    Returns:
+        Selected moments, best first
+    """
+    scored = []
+    for candidate in candidates:
+        try:
+            start = float(candidate['start_time'])
+            virality = float(candidate.get('estimated_virality', 5))
+        except (KeyError, TypeError, ValueError):
+            continue
+        
+        end = start + clip_duration
+        peak = max((p['score'] for p in emotional_peaks if start <= p['time'] <= end), default=0.0)
+        score = (1 - peak_weight) * virality / 10.0 + peak_weight * peak
+        scored.append((score, start, candidate))
+    
+    selected = []
+    for score, start, candidate in sorted(scored, key=lambda item: item[0], reverse=True):
+        if all(abs(start - other_start) >= clip_duration for other_start, _ in selected):
+            selected.append((start, candidate))
+        if len(selected) == num_clips:
+            break
+    
+    return [candidate for _, candidate in selected]
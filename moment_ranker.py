@@ -0,0 +1,243 @@
+"""
+Offline moment ranking from audio energy, transcript content and peaks
+"""
+import re
+import numpy as np
+from keyword_index import KeywordIndex
+
+# Phrases that tend to mark quotable, hook-worthy speech
+HOOK_KEYWORDS = (
+    'secret', 'mistake', 'never', 'always', 'truth', 'biggest', 'worst', 'best', 'how to', 'why',
+    'crazy', 'amazing', 'incredible', 'important', 'lesson', 'story', 'problem', 'money', 'success',
+    'failure', 'nobody', 'everyone', 'the reason', 'here\'s', 'imagine', 'what if', 'actually'
+)
+
+# Share of the window score taken by each feature
+DEFAULT_WEIGHTS = {'energy': 0.3, 'keywords': 0.25, 'speech_rate': 0.15, 'peaks': 0.3}
+
+
+def _spread(values, starts, ends, n_bins, resolution):
+    """
+    Spread per-interval rates over timeline bins with a difference array
+    
+    Args:
+        values: Rate per interval
+        starts: Interval start times in seconds
+        ends: Interval end times in seconds
+        n_bins: Timeline length in bins
+        resolution: Bin width in seconds
+        
+    Returns:
+        Array of length n_bins
+    """
+    first = np.clip((starts / resolution).astype(int), 0, n_bins)
+    last = np.clip(np.ceil(ends / resolution).astype(int), 0, n_bins)
+    diff = np.zeros(n_bins + 1)
+    np.add.at(diff, first, values)
+    np.add.at(diff, last, -values)
+    return np.cumsum(diff[:-1])
+
+
+def timeline_features(transcript, emotional_peaks, energy=None, keywords=HOOK_KEYWORDS, resolution=1.0,
+                      peak_sigma=5.0):
+    """
+    Per-bin feature tracks for the whole video
+    
+    Args:
+        transcript: Transcription result with 'segments'
+        emotional_peaks: List of emotional peaks
+        energy: Optional (times, values) loudness envelope, see
+            EmotionDetector.energy_envelope
+        keywords: Hook phrases counted per bin
+        resolution: Bin width in seconds
+        peak_sigma: Spread of each peak's influence in seconds
+        
+    Returns:
+        Dictionary of feature arrays, one value per bin
+    """
+    segments = [s for s in (transcript or {}).get('segments', []) if s.get('text', '').strip()]
+    starts = np.array([s['start'] for s in segments], dtype=np.float64)
+    ends = np.array([max(s['end'], s['start'] + resolution) for s in segments], dtype=np.float64)
+    peak_times = np.array([p['time'] for p in emotional_peaks], dtype=np.float64)
+    peak_scores = np.array([p['score'] for p in emotional_peaks], dtype=np.float64)
+    
+    duration = max(
+        ends.max(initial=0.0),
+        peak_times.max(initial=0.0),
+        float(energy[0][-1]) if energy is not None and len(energy[0]) else 0.0
+    )
+    n_bins = max(1, int(np.ceil(duration / resolution)))
+    bin_times = (np.arange(n_bins) + 0.5) * resolution
+    
+    features = {}
+    
+    if energy is not None and len(energy[0]):
+        features['energy'] = np.interp(bin_times, energy[0], energy[1])
+    
+    if segments:
+        lengths = ends - starts
+        words = np.array([len(s['text'].split()) for s in segments], dtype=np.float64)
+        features['speech_rate'] = _spread(words / lengths, starts, ends, n_bins, resolution)
+        
+        index = KeywordIndex(keywords)
+        hits = np.array([len(index.search(s['text'])) for s in segments], dtype=np.float64)
+        features['keywords'] = _spread(hits / lengths, starts, ends, n_bins, resolution)
+    
+    if len(peak_times):
+        # Gaussian bump around every peak, scaled by its score
+        impulses = np.zeros(n_bins)
+        np.add.at(impulses, np.clip((peak_times / resolution).astype(int), 0, n_bins - 1), peak_scores)
+        radius = int(np.ceil(3 * peak_sigma / resolution))
+        kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) * resolution / peak_sigma) ** 2)
+        # 'full' then trim: 'same' returns the longer input's length when the kernel outgrows the timeline
+        features['peaks'] = np.convolve(impulses, kernel, mode='full')[radius:radius + n_bins]
+    
+    features['_resolution'] = resolution
+    features['_duration'] = duration
+    return features
+
+
+def _window_means(track, starts, length, resolution):
+    """
+    Mean of a feature track over [start, start + length) for every start
+    
+    Args:
+        track: Per-bin feature values
+        starts: Window start times in seconds
+        length: Window length in seconds
+        resolution: Bin width in seconds
+        
+    Returns:
+        Array of window means
+    """
+    cumulative = np.concatenate(([0.0], np.cumsum(track)))
+    positions = np.arange(len(cumulative)) * resolution
+    totals = np.interp(starts + length, positions, cumulative) - np.interp(starts, positions, cumulative)
+    return totals / (length / resolution)
+
+
+def _normalize(values):
+    """Scale to [0, 1]; a constant feature contributes nothing"""
+    span = values.max() - values.min()
+    if span <= 0:
+        return np.zeros_like(values)
+    return (values - values.min()) / span
+
+
+def score_windows(features, clip_duration, weights=None, stride=1.0, candidate_starts=None):
+    """
+    Score every candidate clip window
+    
+    Args:
+        features: Output of timeline_features
+        clip_duration: Window length in seconds
+        weights: Feature weights, DEFAULT_WEIGHTS by default; weights of
+            missing features are shared out among the others
+        stride: Spacing of grid candidates when candidate_starts is None
+        candidate_starts: Explicit start times, e.g. sentence starts
+        
+    Returns:
+        Tuple of (start times, scores in [0, 1], raw window means per feature)
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    resolution = features['_resolution']
+    last_start = max(0.0, features['_duration'] - clip_duration)
+    
+    if candidate_starts is None or not len(candidate_starts):
+        candidate_starts = np.arange(0.0, last_start + stride, stride)
+    starts = np.unique(np.clip(np.asarray(candidate_starts, dtype=np.float64), 0.0, last_start))
+    
+    present = {name: w for name, w in weights.items() if name in features and w > 0}
+    total_weight = sum(present.values()) or 1.0
+    
+    means = {}
+    scores = np.zeros(len(starts))
+    for name, weight in present.items():
+        means[name] = _window_means(features[name], starts, clip_duration, resolution)
+        scores += weight / total_weight * _normalize(means[name])
+    
+    return starts, scores, means
+
+
+def select_windows(starts, scores, num_clips, clip_duration):
+    """
+    Greedily take the best windows that don't overlap an earlier pick
+    
+    Args:
+        starts: Window start times
+        scores: Window scores
+        num_clips: Maximum windows to take
+        clip_duration: Window length in seconds
+        
+    Returns:
+        Indices into starts, best first
+    """
+    available = np.ones(len(starts), dtype=bool)
+    chosen = []
+    
+    while len(chosen) < num_clips and available.any():
+        best = int(np.argmax(np.where(available, scores, -np.inf)))
+        chosen.append(best)
+        available &= np.abs(starts - starts[best]) >= clip_duration
+    
+    return chosen
+
+
+def _headline(text, max_words=8):
+    """First words of a segment as a clip title"""
+    words = text.split()
+    title = ' '.join(words[:max_words])
+    return title + ('...' if len(words) > max_words else '')
+
+
+def rank_moments(transcript, emotional_peaks, num_clips=5, clip_duration=60, energy=None, keywords=HOOK_KEYWORDS,
+                 weights=None):
+    """
+    Pick the best non-overlapping clips without calling an LLM
+    
+    Candidate clips start on transcript segment boundaries (every second
+    when there is no transcript) and are scored from loudness, hook phrases,
+    speech rate and proximity to emotional peaks.
+    
+    Args:
+        transcript: Transcription result with 'segments', may be None
+        emotional_peaks: List of emotional peaks
+        num_clips: Number of clips to pick
+        clip_duration: Clip length in seconds
+        energy: Optional (times, values) loudness envelope
+        keywords: Hook phrases rewarded in the transcript
+        weights: Feature weights, DEFAULT_WEIGHTS by default
+        
+    Returns:
+        List of moments in the same format as the Gemini results, best
+        first; empty when there is no transcript, peak or energy to rank by
+    """
+    features = timeline_features(transcript, emotional_peaks, energy, keywords)
+    if all(name.startswith('_') for name in features):
+        return []
+    
+    segments = [s for s in (transcript or {}).get('segments', []) if s.get('text', '').strip()]
+    segment_starts = np.array([s['start'] for s in segments], dtype=np.float64)
+    
+    starts, scores, means = score_windows(features, clip_duration, weights, candidate_starts=segment_starts)
+    
+    moments = []
+    for rank, idx in enumerate(select_windows(starts, scores, num_clips, clip_duration)):
+        start = float(starts[idx])
+        
+        # Title and hook come from the sentence the clip opens on
+        opening = next((s['text'].strip() for s in segments if s['start'] >= start - 1e-6), '')
+        hook = re.split(r'(?<=[.!?])\s', opening, maxsplit=1)[0] if opening else ''
+        
+        details = ', '.join(f"{name.replace('_', ' ')} {values[idx]:.2f}" for name, values in means.items())
+        moments.append({
+            'start_time': start,
+            'end_time': start + clip_duration,
+            'title': _headline(opening) if opening else f'High Energy Moment {rank + 1}',
+            'hook': hook or 'Watch this powerful moment',
+            'reason': f'Ranked locally (score: {scores[idx]:.2f}; {details})',
+            'estimated_virality': int(np.clip(round(1 + scores[idx] * 9), 1, 10)),
+            'score': float(scores[idx])
+        })
+    
+    return moments
@@ -0,0 +1,266 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import librosa
+from model_pool import whisper_model_pool
+from transcription_backends import get_backend
+
+# Per-process settings filled in by _init_worker
+_worker_config = {}
+
+# Worker pools are reused across jobs so each worker loads its model once. Every
+# worker holds a model, so only the most recently used pools are kept alive
+MAX_EXECUTORS = 1
+_executors = OrderedDict()
+_executors_lock = threading.RLock()
+
+
+def _init_worker(backend, model_size, device, threads):
+    """
+    Prepare a transcription worker process
+    
+    Args:
+        backend: Transcription backend name
+        model_size: Whisper model size
+        device: Device to run on
+        threads: Compute threads for this worker
+    """
+    # CTranslate2 and OpenMP read this; torch is set explicitly below
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    
+    _worker_config['engine'] = get_backend(backend)
+    _worker_config['model_size'] = model_size
+    _worker_config['device'] = device
+    
+    # Load now so the first chunk doesn't pay for it
+    _worker_config['engine'].load(model_size, device)
+
+
+def _transcribe_chunk(samples, offset):
+    """
+    Transcribe one chunk inside a worker process
+    
+    Args:
+        samples: 16 kHz mono float32 samples
+        offset: Chunk start in the full audio, in seconds
+        
+    Returns:
+        Dictionary with 'segments' in full-audio time and 'language'
+    """
+    engine = _worker_config['engine']
+    model = engine.load(_worker_config['model_size'], _worker_config['device'])
+    result = engine.transcribe(model, samples)
+    
+    segments = []
+    for segment in result['segments']:
+        segments.append({
+            'start': segment['start'] + offset,
+            'end': segment['end'] + offset,
+            'text': segment['text'],
+            'words': [
+                {'word': word['word'], 'start': word['start'] + offset, 'end': word['end'] + offset}
+                for word in segment.get('words', [])
+            ]
+        })
+    
+    return {'segments': segments, 'language': result.get('language', 'unknown')}
+
+
+def _get_executor(backend, model_size, device, workers):
+    """
+    Get (or start) the worker pool for an engine, model and worker count
+    
+    Starting a pool beyond MAX_EXECUTORS shuts down the least recently used
+    one; chunks already queued on it still finish.
+    
+    Args:
+        backend: Transcription backend name
+        model_size: Whisper model size
+        device: Device to run on
+        workers: Number of worker processes
+        
+    Returns:
+        ProcessPoolExecutor
+    """
+    key = (backend, model_size, device, workers)
+    
+    with _executors_lock:
+        if key in _executors:
+            _executors.move_to_end(key)
+        else:
+            while len(_executors) >= MAX_EXECUTORS:
+                _, executor = _executors.popitem(last=False)
+                executor.shutdown(wait=False)
+            
+            # Split the cores between workers so the engines don't oversubscribe
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            
+            # spawn, not fork: forking a process with torch/OpenMP state can deadlock
+            _executors[key] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(backend, model_size, device, threads)
+            )
+        
+        return _executors[key]
+
+
+def shutdown_executors():
+    """Stop every worker pool"""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+
+
+atexit.register(shutdown_executors)
+
+
+def plan_chunks(y, sr, chunk_duration=300.0, overlap=5.0, search_window=15.0):
+    """
+    Pick chunk boundaries at the quietest point near each chunk_duration mark
+    
+    Args:
+        y: Mono samples
+        sr: Sample rate
+        chunk_duration: Target chunk length in seconds
+        overlap: Seconds of audio shared with each neighbouring chunk
+        search_window: Seconds either side of a mark searched for silence
+        
+    Returns:
+        List of (audio_start, audio_end, own_start, own_end) tuples in seconds;
+        each chunk is transcribed over the audio range and owns segments whose
+        midpoint falls in the own range
+    """
+    duration = len(y) / float(sr)
+    if duration <= chunk_duration + overlap:
+        return [(0.0, duration, 0.0, duration)]
+    
+    hop_length = int(0.010 * sr)
+    rms = librosa.feature.rms(y=y, frame_length=4 * hop_length, hop_length=hop_length)[0]
+    frame_time = hop_length / float(sr)
+    
+    cuts = [0.0]
+    mark = chunk_duration
+    while mark < duration - chunk_duration / 4:
+        lo = int(max(mark - search_window, cuts[-1] + overlap) / frame_time)
+        hi = int(min(mark + search_window, duration) / frame_time)
+        cut = (lo + int(np.argmin(rms[lo:hi]))) * frame_time if hi > lo else mark
+        cuts.append(cut)
+        mark = cut + chunk_duration
+    cuts.append(duration)
+    
+    return [
+        (max(0.0, start - overlap), min(duration, end + overlap), start, end)
+        for start, end in zip(cuts[:-1], cuts[1:])
+    ]
+
+
+def merge_chunk_segments(chunk_results, chunks):
+    """
+    Stitch per-chunk segments into one monotonic, de-duplicated list
+    
+    Args:
+        chunk_results: Results of _transcribe_chunk, in chunk order
+        chunks: Output of plan_chunks
+        
+    Returns:
+        List of segments
+    """
+    merged = []
+    
+    for i, (result, (_, _, own_start, own_end)) in enumerate(zip(chunk_results, chunks)):
+        if i == len(chunks) - 1:
+            own_end = float('inf')
+        
+        for segment in result['segments']:
+            # Overlap regions are transcribed twice; keep the copy from the owning chunk
+            midpoint = (segment['start'] + segment['end']) / 2
+            if not own_start <= midpoint < own_end:
+                continue
+            
+            if merged and _is_duplicate(merged[-1], segment):
+                continue
+            
+            # Timestamps never go backwards across a chunk seam
+            floor = merged[-1]['end'] if merged else 0.0
+            segment['start'] = max(segment['start'], floor)
+            segment['end'] = max(segment['end'], segment['start'])
+            for word in segment['words']:
+                word['start'] = min(max(word['start'], segment['start']), segment['end'])
+                word['end'] = min(max(word['end'], word['start']), segment['end'])
+            
+            merged.append(segment)
+    
+    return merged
+
+
+def _is_duplicate(previous, segment):
+    """
+    Whether a segment repeats the previous one across a chunk seam
+    
+    Args:
+        previous: Last kept segment
+        segment: Candidate segment
+        
+    Returns:
+        True if the text matches or most of the segment overlaps in time
+    """
+    if segment['start'] >= previous['end']:
+        return False
+    
+    if segment['text'].strip().lower() == previous['text'].strip().lower():
+        return True
+    
+    duration = max(segment['end'] - segment['start'], 1e-3)
+    return (previous['end'] - segment['start']) / duration > 0.5
+
+
+def transcribe_chunked(y, model_size='base', device=None, workers=2, chunk_duration=300.0, overlap=5.0, sr=16000,
+                       backend='whisper'):
+    """
+    Transcribe long audio as overlapping chunks across a process pool
+    
+    Args:
+        y: 16 kHz mono float32 samples
+        model_size: Whisper model size
+        device: Device to run on
+        workers: Number of worker processes
+        chunk_duration: Target chunk length in seconds
+        overlap: Seconds shared between neighbouring chunks
+        sr: Sample rate of y
+        backend: Transcription backend name
+        
+    Returns:
+        Whisper-style result with 'text', 'segments' and 'language'
+    """
+    chunks = plan_chunks(y, sr, chunk_duration=chunk_duration, overlap=overlap)
+    
+    # Submit under the pool lock so another job can't shut this pool down in between
+    with _executors_lock:
+        executor = _get_executor(backend, model_size, device or whisper_model_pool.resolve_device(None), workers)
+        futures = [
+            executor.submit(_transcribe_chunk, np.ascontiguousarray(y[int(start * sr):int(end * sr)]), start)
+            for start, end, _, _ in chunks
+        ]
+    results = [future.result() for future in futures]
+    
+    segments = merge_chunk_segments(results, chunks)
+    languages = Counter(result['language'] for result in results)
+    
+    return {
+        'text': ''.join(segment['text'] for segment in segments),
+        'segments': segments,
+        'language': languages.most_common(1)[0][0] if languages else 'unknown'
+    }
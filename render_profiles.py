@@ -0,0 +1,132 @@
+"""
+Named encoder settings trading render speed for output quality
+"""
+import os
+
+CPU_COUNT = os.cpu_count() or 1
+
+# preset/crf: libx264 settings; threads: x264 threads per clip, further capped so
+# parallel render workers never exceed the cores (small ultrafast frames gain
+# little past a couple of threads, slow presets use every core);
+# max_height: downscale taller sources, None keeps the source height
+RENDER_PROFILES = {
+    'draft': {
+        'preset': 'ultrafast',
+        'crf': 28,
+        'threads': min(2, CPU_COUNT),
+        'max_height': 480,
+        'audio_bitrate': '96k'
+    },
+    'standard': {
+        'preset': 'medium',
+        'crf': 23,
+        'threads': max(1, CPU_COUNT // 2),
+        'max_height': 1080,
+        'audio_bitrate': '128k'
+    },
+    'archive': {
+        'preset': 'slow',
+        'crf': 18,
+        'threads': CPU_COUNT,
+        'max_height': None,
+        'audio_bitrate': '192k'
+    }
+}
+
+DEFAULT_PROFILE = 'standard'
+
+
+def get_render_profile(name=DEFAULT_PROFILE):
+    """
+    Look up a render profile by name
+    
+    Args:
+        name: Profile name, see RENDER_PROFILES
+        
+    Returns:
+        Copy of the profile settings with its 'name'
+    """
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {name}")
+    return dict(RENDER_PROFILES[name], name=name)
+
+
+def ffmpeg_encoder_args(profile, threads=None):
+    """
+    ffmpeg output options for a profile
+    
+    Args:
+        profile: Profile settings from get_render_profile
+        threads: Encoder threads, overrides the profile's
+        
+    Returns:
+        List of ffmpeg arguments
+    """
+    threads = threads or profile['threads']
+    thread_args = ['-threads', str(threads)] if threads else []
+    
+    return [
+        '-c:v', 'libx264',
+        '-preset', profile['preset'],
+        '-crf', str(profile['crf'])
+    ] + thread_args + [
+        '-c:a', 'aac',
+        '-b:a', profile['audio_bitrate']
+    ]
+
+
+def fit_size(width, height, profile):
+    """
+    Output frame size for a source size under the profile's max height
+    
+    Args:
+        width: Source width
+        height: Source height
+        profile: Profile settings from get_render_profile
+        
+    Returns:
+        Tuple of (width, height), even and aspect-preserving
+    """
+    max_height = profile['max_height']
+    if max_height and height > max_height:
+        width, height = width * max_height / height, max_height
+    
+    # Even dimensions for yuv420p
+    return int(round(width / 2)) * 2, int(round(height / 2)) * 2
+
+
+def moviepy_write_params(profile, threads=None):
+    """
+    Keyword arguments for MoviePy's write_videofile
+    
+    Args:
+        profile: Profile settings from get_render_profile
+        threads: Encoder threads, overrides the profile's
+        
+    Returns:
+        Dictionary of write_videofile arguments
+    """
+    return {
+        'codec': 'libx264',
+        'audio_codec': 'aac',
+        'preset': profile['preset'],
+        'audio_bitrate': profile['audio_bitrate'],
+        'threads': threads or profile['threads'],
+        'ffmpeg_params': ['-crf', str(profile['crf'])]
+    }
+
+
+def fit_height(clip, profile):
+    """
+    Downscale a MoviePy clip to the profile's max height
+    
+    Args:
+        clip: MoviePy clip
+        profile: Profile settings from get_render_profile
+        
+    Returns:
+        Resized clip, or the clip itself when it already fits
+    """
+    if not profile['max_height'] or clip.h <= profile['max_height']:
+        return clip
+    return clip.resized(fit_size(clip.w, clip.h, profile))
@@ -0,0 +1,175 @@
+"""
+Face-tracked crop paths for vertical clips
+"""
+import subprocess
+import numpy as np
+import imageio_ffmpeg
+
+# Try to import mediapipe with fallback for different versions
+try:
+    import mediapipe as mp
+    # Check if solutions attribute exists (older API)
+    if hasattr(mp, 'solutions'):
+        MP_FACE_DETECTION = mp.solutions.face_detection
+        MEDIAPIPE_AVAILABLE = True
+    else:
+        # Newer mediapipe versions have different structure
+        MEDIAPIPE_AVAILABLE = False
+        MP_FACE_DETECTION = None
+except ImportError:
+    MEDIAPIPE_AVAILABLE = False
+    MP_FACE_DETECTION = None
+
+
+def sample_face_centers(video_path, start, end, frame_size, sample_fps=3.0, analysis_height=256):
+    """
+    Detect the main face on sparse, downscaled frames
+    
+    Frames are decoded by ffmpeg at sample_fps and analysis_height, so
+    detection never touches full-resolution video.
+    
+    Args:
+        video_path: Path to source video
+        start: Start time in seconds
+        end: End time in seconds
+        frame_size: Source (width, height)
+        sample_fps: Frames analysed per second
+        analysis_height: Height frames are downscaled to before detection
+        
+    Returns:
+        Tuple of (sample times relative to start, face center x as a fraction
+        of the frame width, NaN where no face was found)
+    """
+    width, height = frame_size
+    analysis_height = min(analysis_height, height)
+    analysis_width = int(round(width * analysis_height / height / 2)) * 2
+    frame_bytes = analysis_width * analysis_height * 3
+    
+    cmd = [
+        imageio_ffmpeg.get_ffmpeg_exe(),
+        '-nostdin',
+        '-v', 'error',
+        # Detection doesn't need B-frames or deblocking; skipping them speeds up decode
+        '-skip_frame', 'noref',
+        '-skip_loop_filter', 'all',
+        '-ss', f"{start:.3f}",
+        '-i', video_path,
+        '-t', f"{end - start:.3f}",
+        '-an',
+        '-vf', f"fps={sample_fps:g},scale={analysis_width}:{analysis_height}",
+        '-f', 'rawvideo',
+        '-pix_fmt', 'rgb24',
+        'pipe:1'
+    ]
+    
+    centers = []
+    # model_selection=1: full-range model, faces further from the camera
+    with MP_FACE_DETECTION.FaceDetection(model_selection=1, min_detection_confidence=0.5) as detector:
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc:
+            while True:
+                data = proc.stdout.read(frame_bytes)
+                if len(data) < frame_bytes:
+                    break
+                
+                frame = np.frombuffer(data, dtype=np.uint8).reshape(analysis_height, analysis_width, 3)
+                results = detector.process(frame)
+                
+                if results.detections:
+                    # Follow the largest face
+                    box = max(
+                        (d.location_data.relative_bounding_box for d in results.detections),
+                        key=lambda b: b.width * b.height
+                    )
+                    centers.append(box.xmin + box.width / 2)
+                else:
+                    centers.append(np.nan)
+    
+    centers = np.asarray(centers, dtype=np.float64)
+    return np.arange(len(centers)) / sample_fps, centers
+
+
+def smooth_centers(centers, sample_fps, crop_fraction, smooth_seconds=1.0, dead_zone=0.04):
+    """
+    Turn raw face centers into a steady crop-center path
+    
+    Args:
+        centers: Face center fractions, NaN where no face was found
+        sample_fps: Sampling rate of centers
+        crop_fraction: Crop width as a fraction of the frame width
+        smooth_seconds: Moving-average window in seconds
+        dead_zone: Center shifts smaller than this (fraction of the frame
+            width) are ignored so the crop doesn't wobble
+            
+    Returns:
+        Crop centers as fractions of the frame width, kept inside the frame
+    """
+    valid = ~np.isnan(centers)
+    idx = np.arange(len(centers))
+    
+    # Fill misses from neighbouring detections
+    path = np.interp(idx, idx[valid], centers[valid])
+    
+    # Hold position until the face moves past the dead zone
+    held = path.copy()
+    for i in range(1, len(held)):
+        held[i] = held[i - 1] if abs(path[i] - held[i - 1]) < dead_zone else path[i]
+    
+    window = max(1, int(round(smooth_seconds * sample_fps)))
+    if window > 1:
+        padded = np.pad(held, (window // 2, window - 1 - window // 2), mode='edge')
+        held = np.convolve(padded, np.ones(window) / window, mode='valid')
+    
+    half = crop_fraction / 2
+    return np.clip(held, half, 1 - half)
+
+
+def track_crop(video_path, start, end, frame_size, aspect_ratio=(9, 16), sample_fps=3.0, analysis_height=256,
+               smooth_seconds=1.0):
+    """
+    Plan a face-following crop for a clip
+    
+    Args:
+        video_path: Path to source video
+        start: Start time in seconds
+        end: End time in seconds
+        frame_size: Source (width, height)
+        aspect_ratio: Target (width, height) ratio
+        sample_fps: Frames analysed per second
+        analysis_height: Height frames are downscaled to before detection
+        smooth_seconds: Moving-average window in seconds
+        
+    Returns:
+        Tuple of (times relative to start, crop center fractions), or None when
+        MediaPipe is unavailable, no crop is needed or no face was found
+    """
+    if not MEDIAPIPE_AVAILABLE:
+        return None
+    
+    width, height = frame_size
+    crop_fraction = height * aspect_ratio[0] / aspect_ratio[1] / width
+    if crop_fraction >= 1:
+        return None
+    
+    times, centers = sample_face_centers(video_path, start, end, frame_size, sample_fps, analysis_height)
+    if not np.any(~np.isnan(centers)):
+        return None
+    
+    return times, smooth_centers(centers, sample_fps, crop_fraction, smooth_seconds)
+
+
+def crop_left_edges(track, times, frame_width, crop_width):
+    """
+    Crop x offsets along a track
+    
+    Args:
+        track: Output of track_crop
+        times: Times relative to the clip start
+        frame_width: Source frame width in pixels
+        crop_width: Crop width in pixels
+        
+    Returns:
+        Integer array of left edges, even and inside the frame
+    """
+    centers = np.interp(times, track[0], track[1])
+    x = np.clip(np.round(centers * frame_width - crop_width / 2), 0, frame_width - crop_width)
+    return (x.astype(int) // 2) * 2
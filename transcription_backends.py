@@ -0,0 +1,195 @@
+import os
+import threading
+from model_pool import WhisperModelPool, whisper_model_pool
+
+# faster-whisper (CTranslate2) is optional; without it only the openai-whisper engine is offered
+try:
+    from faster_whisper import WhisperModel as FasterWhisperModel
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FasterWhisperModel = None
+    FASTER_WHISPER_AVAILABLE = False
+
+
+class TranscriptionBackend:
+    """Interface every transcription engine implements"""
+    
+    name = None
+    
+    def load(self, model_size='base', device=None):
+        """
+        Get a loaded model for this engine
+        
+        Args:
+            model_size: Whisper model size ('tiny', 'base', 'small', 'medium', 'large')
+            device: Device to run on, engine default when None
+            
+        Returns:
+            Engine-specific model object
+        """
+        raise NotImplementedError
+    
+    def warm_up(self, model_size='base', device=None):
+        """
+        Start loading a model in the background
+        
+        Args:
+            model_size: Whisper model size
+            device: Device to run on, engine default when None
+            
+        Returns:
+            The loader thread
+        """
+        raise NotImplementedError
+    
+    def transcribe(self, model, audio):
+        """
+        Transcribe audio with a loaded model
+        
+        Args:
+            model: Model returned by load
+            audio: Path to audio file or 16 kHz mono float32 samples
+            
+        Returns:
+            Dictionary with 'text', 'language' and 'segments'; each segment has
+            'start', 'end', 'text' and 'words' ('word', 'start', 'end')
+        """
+        raise NotImplementedError
+
+
+class WhisperBackend(TranscriptionBackend):
+    """Reference openai-whisper engine (PyTorch)"""
+    
+    name = 'whisper'
+    
+    def load(self, model_size='base', device=None):
+        return whisper_model_pool.get(model_size, device)
+    
+    def warm_up(self, model_size='base', device=None):
+        return whisper_model_pool.warm_up([model_size], device)
+    
+    def transcribe(self, model, audio):
+        # Transcribe (without verbose parameter for compatibility)
+        result = model.transcribe(
+            audio,
+            word_timestamps=True
+        )
+        
+        return {
+            'text': result['text'],
+            'language': result.get('language', 'unknown'),
+            'segments': [
+                {
+                    'start': segment['start'],
+                    'end': segment['end'],
+                    'text': segment['text'],
+                    'words': [
+                        {'word': word['word'], 'start': word['start'], 'end': word['end']}
+                        for word in segment.get('words', [])
+                    ]
+                }
+                for segment in result['segments']
+            ]
+        }
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """CTranslate2 engine with int8 quantized weights, several times faster on CPU"""
+    
+    name = 'faster-whisper'
+    
+    # One pool per compute type, shared by every instance in the process
+    _pools = {}
+    _pools_lock = threading.Lock()
+    
+    def __init__(self, compute_type='int8'):
+        """
+        Initialize the backend
+        
+        Args:
+            compute_type: CTranslate2 weight type ('int8', 'int8_float16', 'float16', 'float32')
+        """
+        if not FASTER_WHISPER_AVAILABLE:
+            raise ImportError("faster-whisper is not installed (pip install faster-whisper)")
+        
+        self.compute_type = compute_type
+    
+    def _pool(self):
+        """Model pool for this backend's compute type"""
+        with self._pools_lock:
+            if self.compute_type not in self._pools:
+                compute_type = self.compute_type
+                
+                def _load(model_size, device):
+                    # cpu_threads=0 lets CTranslate2 choose; workers set OMP_NUM_THREADS
+                    return FasterWhisperModel(
+                        model_size,
+                        device=device,
+                        compute_type=compute_type,
+                        cpu_threads=int(os.environ.get('OMP_NUM_THREADS', 0))
+                    )
+                
+                self._pools[compute_type] = WhisperModelPool(loader=_load)
+            
+            return self._pools[self.compute_type]
+    
+    def load(self, model_size='base', device=None):
+        return self._pool().get(model_size, device)
+    
+    def warm_up(self, model_size='base', device=None):
+        return self._pool().warm_up([model_size], device)
+    
+    def transcribe(self, model, audio):
+        segments_iter, info = model.transcribe(audio, word_timestamps=True)
+        
+        segments = []
+        for segment in segments_iter:
+            segments.append({
+                'start': segment.start,
+                'end': segment.end,
+                'text': segment.text,
+                'words': [
+                    {'word': word.word, 'start': word.start, 'end': word.end}
+                    for word in (segment.words or [])
+                ]
+            })
+        
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'language': info.language or 'unknown',
+            'segments': segments
+        }
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend
+}
+
+
+def available_backends():
+    """
+    Names of the engines that can run in this environment
+    
+    Returns:
+        List of backend names
+    """
+    names = [WhisperBackend.name]
+    if FASTER_WHISPER_AVAILABLE:
+        names.append(FasterWhisperBackend.name)
+    return names
+
+
+def get_backend(name='whisper'):
+    """
+    Create a transcription backend by name
+    
+    Args:
+        name: Backend name, see BACKENDS
+        
+    Returns:
+        TranscriptionBackend instance
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return BACKENDS[name]()
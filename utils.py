@@ -3,6 +3,9 @@ Utility functions for PulsePoint AI
 """
 import os
 import re
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
 from urllib.parse import urlparse, parse_qs
 import requests
 
@@ -163,18 +166,64 @@ def get_file_size_mb(file_path):
     return round(size_mb, 2)
 
 
-def cleanup_temp_files(directory):
+@contextmanager
+def atomic_output(path, suffix=None):
+    """
+    Write a file under a temporary name and rename it into place on success
+    
+    Readers never see a partial file; on failure the temporary file is removed.
+    
+    Args:
+        path: Final file path
+        suffix: Extension of the temporary file; the final one by default so
+            tools like ffmpeg pick the right format. Caches pass '.part' to
+            keep in-progress files out of their globs
+            
+    Yields:
+        Temporary path in the same directory to write to
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.stem}.{uuid.uuid4().hex[:8]}{path.suffix if suffix is None else suffix}")
+    
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def cleanup_temp_files(directory, max_age_seconds=None, keep=()):
     """
     Clean up temporary files in directory
     
     Args:
         directory: Directory to clean
+        max_age_seconds: Only remove entries not modified for this long;
+            everything is removed when None
+        keep: Entry names never removed (e.g. jobs still in use)
     """
     import shutil
+    import time
     
-    if os.path.exists(directory):
+    if not os.path.exists(directory):
+        return
+    
+    now = time.time()
+    for name in os.listdir(directory):
+        if name in keep:
+            continue
+        
+        path = os.path.join(directory, name)
         try:
-            shutil.rmtree(directory)
-            os.makedirs(directory)
+            if max_age_seconds is not None and now - os.path.getmtime(path) < max_age_seconds:
+                continue
+            
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            # Removed concurrently by another cleanup
+            pass
         except Exception as e:
             print(f"Error cleaning up temp files: {str(e)}")
@@ -1,7 +1,18 @@
 import os
+import hashlib
+import subprocess
 from pathlib import Path
+import numpy as np
+import imageio_ffmpeg
 from moviepy import VideoFileClip, AudioFileClip
 import tempfile
+import render_profiles
+from clip_cache import source_fingerprint
+from utils import atomic_output, cleanup_temp_files
+
+# Analysis proxies are shared across jobs and dropped after a day unused
+PROXY_DIR = Path(tempfile.gettempdir()) / "pulsepoint_proxies"
+PROXY_TTL_SECONDS = 24 * 3600
 
 
 class VideoProcessor:
@@ -19,6 +30,8 @@ class VideoProcessor:
         self.duration = 0
         self.fps = 0
         self.size = (0, 0)
+        self.audio_fps = 44100
+        self._analysis_proxy = None
         
         self._load_video()
     
@@ -29,6 +42,9 @@ class VideoProcessor:
             self.duration = self.video.duration
             self.fps = self.video.fps
             self.size = self.video.size
+            # The rate extract_audio writes at, so both audio paths analyse the same samples
+            if self.video.audio is not None:
+                self.audio_fps = self.video.audio.fps
         except Exception as e:
             raise Exception(f"Failed to load video: {str(e)}")
     
@@ -43,9 +59,9 @@ class VideoProcessor:
             Path to extracted audio file
         """
         if output_path is None:
-            # Create temp file for audio
-            temp_dir = tempfile.gettempdir()
-            output_path = os.path.join(temp_dir, "extracted_audio.wav")
+            # Unique temp file per job so concurrent jobs don't overwrite each other
+            fd, output_path = tempfile.mkstemp(prefix="pulsepoint_audio_", suffix=".wav")
+            os.close(fd)
         
         try:
             audio = self.video.audio
@@ -55,6 +71,183 @@ class VideoProcessor:
         except Exception as e:
             raise Exception(f"Failed to extract audio: {str(e)}")
     
+    def extract_audio_array(self, sample_rate=16000, channels=1, out_path=None):
+        """
+        Decode the audio track through an ffmpeg pipe, no WAV round trip
+        
+        Args:
+            sample_rate: Output sample rate (16 kHz suits Whisper); None uses
+                audio_fps, the rate extract_audio writes
+            channels: Output channel count
+            out_path: Optional .npy path; the pipe then fills a memory-mapped
+                file instead of process memory, so long tracks never sit in RAM
+            
+        Returns:
+            float32 array (read-only memmap with out_path), shape (samples,)
+            for mono or (samples, channels)
+        """
+        sample_rate = sample_rate or self.audio_fps
+        
+        cmd = [
+            imageio_ffmpeg.get_ffmpeg_exe(),
+            '-nostdin',
+            '-v', 'error',
+            '-i', self.video_path,
+            '-vn',
+            '-ac', str(channels),
+            '-ar', str(sample_rate),
+            '-f', 'f32le',
+            'pipe:1'
+        ]
+        
+        try:
+            # Size the buffer from the container duration; grown below if that was short
+            frame_values = sample_rate * channels
+            buffer = self._audio_buffer(int((self.duration + 1) * frame_values), out_path)
+            filled = 0
+            
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+                while True:
+                    if filled == buffer.nbytes:
+                        buffer = self._audio_buffer(len(buffer) + 30 * frame_values, out_path, buffer)
+                    
+                    # Read PCM directly into the array, no intermediate bytes objects
+                    n = proc.stdout.readinto(memoryview(buffer).cast('B')[filled:])
+                    if not n:
+                        break
+                    filled += n
+                
+                stderr = proc.stderr.read()
+                proc.wait()
+            
+            if proc.returncode != 0:
+                raise RuntimeError(stderr.decode(errors='replace').strip() or f"ffmpeg exited with {proc.returncode}")
+            
+            n_frames = filled // (4 * channels)
+            if out_path:
+                buffer.flush()
+                del buffer
+                buffer = np.load(out_path, mmap_mode='r')
+            
+            samples = buffer[:n_frames * channels]
+            if channels > 1:
+                samples = samples.reshape(n_frames, channels)
+            
+            return samples
+            
+        except Exception as e:
+            if out_path and os.path.exists(out_path):
+                os.remove(out_path)
+            raise Exception(f"Failed to extract audio: {str(e)}")
+    
+    @staticmethod
+    def _audio_buffer(size, out_path=None, previous=None):
+        """
+        Allocate the float32 decode buffer, keeping what previous already holds
+        
+        Args:
+            size: Values the buffer holds
+            out_path: .npy path for a memory-mapped buffer, in memory when None
+            previous: Buffer being grown
+            
+        Returns:
+            Writable array or memmap
+        """
+        if not out_path:
+            buffer = np.empty(size, dtype=np.float32)
+            if previous is not None:
+                buffer[:len(previous)] = previous
+            return buffer
+        
+        if previous is None:
+            return np.lib.format.open_memmap(out_path, mode='w+', dtype=np.float32, shape=(size,))
+        
+        # A .npy header fixes the shape, so grow into a new file and swap it in
+        grown_path = f"{out_path}.grow"
+        buffer = np.lib.format.open_memmap(grown_path, mode='w+', dtype=np.float32, shape=(size,))
+        buffer[:len(previous)] = previous
+        previous.flush()
+        del previous
+        buffer.flush()
+        del buffer
+        os.replace(grown_path, out_path)
+        return np.load(out_path, mmap_mode='r+')
+    
+    def get_analysis_proxy(self, height=360, max_fps=15, keyframe_interval=0.5):
+        """
+        Low-resolution, fast-decoding copy of the video for analysis steps
+        
+        Transcoded once per source content and settings, then reused across
+        jobs. Face tracking and other steps that only look at the picture
+        read this instead of the full-resolution source; final renders still
+        read the original. Timestamps match the source.
+        
+        Args:
+            height: Proxy frame height (never upscaled)
+            max_fps: Frame rate cap
+            keyframe_interval: Seconds between keyframes, so seeks decode little
+            
+        Returns:
+            Path to the proxy video
+        """
+        if self._analysis_proxy and os.path.exists(self._analysis_proxy):
+            return self._analysis_proxy
+        
+        try:
+            settings = f"{source_fingerprint(self.video_path)}:{height}:{max_fps}:{keyframe_interval}"
+            proxy_path = PROXY_DIR / f"{hashlib.sha256(settings.encode()).hexdigest()[:32]}.mp4"
+            
+            if not proxy_path.exists():
+                PROXY_DIR.mkdir(parents=True, exist_ok=True)
+                cleanup_temp_files(str(PROXY_DIR), max_age_seconds=PROXY_TTL_SECONDS)
+                self._write_proxy(proxy_path, height, max_fps, keyframe_interval)
+            
+            # Keep it clear of TTL cleanup while in use
+            os.utime(proxy_path)
+            self._analysis_proxy = str(proxy_path)
+            return self._analysis_proxy
+            
+        except Exception as e:
+            raise Exception(f"Failed to create analysis proxy: {str(e)}")
+    
+    def _write_proxy(self, proxy_path, height, max_fps, keyframe_interval):
+        """
+        Transcode the analysis proxy, renaming it into place when complete
+        
+        Args:
+            proxy_path: Final proxy path
+            height: Proxy frame height
+            max_fps: Frame rate cap
+            keyframe_interval: Seconds between keyframes
+        """
+        fps = min(self.fps or max_fps, max_fps)
+        filters = [f"scale=-2:'min(ih,{height})'"]
+        if self.fps and self.fps > max_fps:
+            filters.append(f"fps={max_fps}")
+        
+        with atomic_output(proxy_path) as partial_path:
+            cmd = [
+                imageio_ffmpeg.get_ffmpeg_exe(),
+                '-nostdin',
+                '-v', 'error',
+                '-y',
+                '-i', self.video_path,
+                '-an',
+                '-vf', ','.join(filters),
+                '-c:v', 'libx264',
+                '-preset', 'ultrafast',
+                # No CABAC or deblocking: cheapest H.264 to decode
+                '-tune', 'fastdecode',
+                '-crf', '28',
+                '-g', str(max(1, int(round(fps * keyframe_interval)))),
+                '-pix_fmt', 'yuv420p',
+                str(partial_path)
+            ]
+            
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip() or f"ffmpeg exited with {result.returncode}")
+    
     def get_video_info(self):
         """
         Get video metadata
@@ -70,7 +263,7 @@ class VideoProcessor:
             'height': self.size[1]
         }
     
-    def extract_subclip(self, start_time, end_time, output_path):
+    def extract_subclip(self, start_time, end_time, output_path, profile=render_profiles.DEFAULT_PROFILE):
         """
         Extract a subclip from the video
         
@@ -78,11 +271,14 @@ class VideoProcessor:
             start_time: Start time in seconds
             end_time: End time in seconds
             output_path: Path for output video file
+            profile: Render profile name, see render_profiles
             
         Returns:
             Path to the extracted clip
         """
         try:
+            profile = render_profiles.get_render_profile(profile)
+            
             # Ensure times are within video duration
             start_time = max(0, start_time)
             end_time = min(self.duration, end_time)
@@ -97,10 +293,9 @@ class VideoProcessor:
                 subclip = self.video.subclip(start_time, end_time)
             
             # Write to file
-            subclip.write_videofile(
+            render_profiles.fit_height(subclip, profile).write_videofile(
                 output_path,
-                codec='libx264',
-                audio_codec='aac',
+                **render_profiles.moviepy_write_params(profile)
             )
             
             subclip.close()